@@ -0,0 +1,73 @@
+# analysis_cache.py
+
+import pickle
+import hashlib
+import functools
+import weakref
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+class MemoryCache:
+    """In-process LRU backend. Frames and series are keyed by identity (held as weak references, so a collected frame
+    can never match a new one), everything else by a hash of its pickle; like the wave registry, this relies on
+    callers not mutating a frame after analysing it, and makes a lookup cost the same at any respondent count.
+    Frame and series results are handed out as copies (result tables are small, and a shallow copy only protects the
+    entry under copy-on-write, which pandas < 3 leaves off), so a caller that edits its table in place, e.g. by
+    renaming columns or writing a cell, cannot change what later calls get."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(fn, args, kwargs):
+        frames, plain = [], []
+        for value in list(args) + [v for _, v in sorted(kwargs.items())]:
+            if isinstance(value, (pd.DataFrame, pd.Series)): frames.append(weakref.ref(value)); plain.append(('frame', id(value)))
+            else: plain.append(value)
+        digest = hashlib.sha1(pickle.dumps((plain, sorted(kwargs)), protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+        return (fn.__module__, fn.__qualname__, digest), frames
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def memoized(*args, **kwargs):
+            key, frames = self._key(fn, args, kwargs)
+            with self._lock:
+                entry = self._results.get(key)
+                if entry is not None and all(ref() is not None for ref in entry[1]):
+                    self._results.move_to_end(key); return _detached(entry[0])
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self._results[key] = (result, frames)
+                while len(self._results) > self.max_entries: self._results.popitem(last=False)
+            return _detached(result)
+        return memoized
+
+def _detached(result):
+    return result.copy() if isinstance(result, (pd.DataFrame, pd.Series)) else result
+
+_backend = None
+_bound = {}
+_lock = threading.Lock()
+
+def set_cache_backend(backend):
+    """Installs backend (a decorator such as st.cache_data or MemoryCache(); None calls functions directly) for every
+    @cached function, including ones already imported. Reinstalling the current backend keeps its wrappers.
+    Backends must not hand callers an object they also keep: st.cache_data returns unpickled copies and MemoryCache
+    copies of frames."""
+    global _backend
+    with _lock:
+        if backend is not _backend: _backend = backend; _bound.clear()
+
+def cached(fn):
+    """Routes calls of fn through the installed cache backend, wrapping fn on its first call under each backend.
+    fn itself stays reachable as __wrapped__ for uncached calls."""
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        with _lock:
+            target = _bound.get(fn)
+            if target is None: target = _bound[fn] = fn if _backend is None else _backend(fn)
+        return target(*args, **kwargs)
+    return call
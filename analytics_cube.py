@@ -0,0 +1,131 @@
+# analytics_cube.py
+
+import numpy as np
+import pandas as pd
+
+from wave_data import lowercase_columns, wave_schema
+from utils_V2_new import (answered_matrix, imagery_hit_tensor, rating_histograms, grouped_counts, ComparisonMatrix,
+                          nps_comparisons, tom_comparisons, segmented_nps_comparisons, imagery_comparisons, sectional_nps_comparisons)
+
+CUBE_DIMENSIONS = ('gender', 'age_group', 'nccs_group')
+
+class WaveCube:
+    """Sufficient statistics of one wave for every gender x age group x NCCS cell, computed once from the respondent rows.
+    Respondents missing a dimension form a cell of their own so 'All' still covers them. Any filter combination is answered
+    by summing the selected cells, and the analysis methods return the same tables as the utils_V2_new functions would on
+    the filtered rows. The *_comparisons methods return every brand-vs-brand test at once, so switching the reference
+    brand only slices them."""
+
+    def __init__(self, df):
+        df = lowercase_columns(df)
+        n_rows = len(df)
+        self.dimensions, self.levels, shape = [], {}, []
+        codes = np.zeros(n_rows, dtype=np.int64)
+        for dim in CUBE_DIMENSIONS:
+            if dim not in df.columns: continue
+            dim_codes, uniques = pd.factorize(df[dim])
+            self.dimensions.append(dim); self.levels[dim] = list(uniques); shape.append(len(uniques) + 1)
+            codes = codes * (len(uniques) + 1) + np.where(dim_codes >= 0, dim_codes, len(uniques))
+        self.shape = tuple(shape)
+        n_cells = int(np.prod(shape)) if shape else 1
+        self.respondents = np.bincount(codes, minlength=n_cells)
+        self.first_row = np.full(n_cells, n_rows)
+        np.minimum.at(self.first_row, codes, np.arange(n_rows))
+
+        self.schema = schema = wave_schema(df)
+        self.q7_cols = schema.q7_cols
+        self.nps_hist = rating_histograms(df, self.q7_cols, codes, n_cells)
+        answered = answered_matrix(df, self.q7_cols)
+        self.brand_base = grouped_counts(answered, codes, n_cells)
+
+        self.question_numbers = schema.statements
+        agree, self.imagery_asked = imagery_hit_tensor(df, schema)
+        agree &= answered[:, None, :]
+        self.imagery_hits = grouped_counts(agree, codes, n_cells).reshape(n_cells, len(self.question_numbers), len(self.q7_cols))
+
+        self.section_cols, self.section_brands, self.section_nums = schema.sections()
+        self.section_hist = rating_histograms(df, self.section_cols, codes, n_cells)
+
+        self.tom_col = schema.tom_col
+        self.tom_values, self.tom_counts, self.tom_first_row = [], np.zeros((n_cells, 0), dtype=np.int64), np.zeros((n_cells, 0), dtype=np.int64)
+        if self.tom_col is not None:
+            q5_series = df[self.tom_col]
+            rows = np.flatnonzero(q5_series.notna().to_numpy())
+            value_codes, uniques = pd.factorize(q5_series.iloc[rows].astype(int))
+            self.tom_values = list(uniques)
+            flat = codes[rows] * len(uniques) + value_codes
+            self.tom_counts = np.bincount(flat, minlength=n_cells * len(uniques)).reshape(n_cells, len(uniques))
+            self.tom_first_row = np.full(n_cells * len(uniques), n_rows)
+            np.minimum.at(self.tom_first_row, flat, rows)
+            self.tom_first_row = self.tom_first_row.reshape(n_cells, len(uniques))
+
+    def cell_mask(self, gender="All", age_group="All", nccs_group="All"):
+        """Boolean mask over cells for the sidebar filters; 'All' (or a dimension the wave lacks) keeps every level."""
+        mask = np.ones(self.shape, dtype=bool)
+        for axis, dim in enumerate(self.dimensions):
+            value = {'gender': gender, 'age_group': age_group, 'nccs_group': nccs_group}[dim]
+            if value == "All": continue
+            keep = np.array([level == value for level in self.levels[dim]] + [False])
+            mask &= keep.reshape([-1 if a == axis else 1 for a in range(len(self.shape))])
+        return mask.ravel()
+
+    def _q_ref(self, ref_col_name):
+        q_ref = next((col for col in self.q7_cols if col == ref_col_name.lower()), None)
+        if q_ref is None: raise ValueError(f"Reference column '{ref_col_name}' not found.")
+        return q_ref
+
+    def nps_comparisons(self, mask):
+        return nps_comparisons(self.q7_cols, self.nps_hist[mask].sum(axis=0))
+
+    def nps_analysis(self, mask, ref_col_name="q7_3"):
+        return self.nps_comparisons(mask).table(self._q_ref(ref_col_name))
+
+    def tom_comparisons(self, mask):
+        if self.tom_col is None: raise ValueError("Could not find a TOM column like 'q5a_1' or 'q5a_brand1'.")
+        counts, first_row = self.tom_counts[mask].sum(axis=0), self.tom_first_row[mask].min(axis=0, initial=np.iinfo(np.int64).max)
+        order = [k for k in np.lexsort((first_row, -counts)) if counts[k] > 0]
+        return tom_comparisons([self.tom_values[k] for k in order], counts[order])
+
+    def tom(self, mask, ref_brand):
+        return self.tom_comparisons(mask).table(ref_brand)
+
+    def imagery_comparisons(self, mask):
+        respondents = self.brand_base[mask].sum(axis=0)
+        hits = np.where(self.imagery_asked, self.imagery_hits[mask].sum(axis=0), np.nan)
+        return imagery_comparisons(self.question_numbers, self.q7_cols, hits, respondents, dict(zip(self.q7_cols, respondents)), self.schema.q7_brands)
+
+    def imagery(self, mask, ref_col_name="q7_3"):
+        return self.imagery_comparisons(mask).table(self._q_ref(ref_col_name))
+
+    def segmented_comparisons(self, mask, segment_col):
+        segment_cols = [segment_col.lower()] if isinstance(segment_col, str) else [str(c).lower() for c in segment_col]
+        cell_shape = self.shape + self.nps_hist.shape[1:]
+        selected_hist = np.where(mask[:, None, None], self.nps_hist, 0).reshape(cell_shape)
+        selected_respondents = np.where(mask, self.respondents, 0).reshape(self.shape)
+        first_row = np.where(mask, self.first_row, np.iinfo(np.int64).max).reshape(self.shape)
+        segments, segmentations, hists = [], [], []
+        for col in segment_cols:
+            if col not in self.dimensions: raise KeyError(col)
+            axis = self.dimensions.index(col)
+            other_axes = tuple(a for a in range(len(self.shape)) if a != axis)
+            level_hist = selected_hist.sum(axis=other_axes)[:-1]
+            level_respondents = selected_respondents.sum(axis=other_axes)[:-1]
+            level_first_row = first_row.min(axis=other_axes)[:-1]
+            for k in sorted(np.flatnonzero(level_respondents), key=lambda k: level_first_row[k]):
+                segments.append(self.levels[col][k]); segmentations.append(col); hists.append(level_hist[k])
+        if not segments: return ComparisonMatrix.empty()
+        return segmented_nps_comparisons(segments, segmentations, self.q7_cols, np.stack(hists), labelled=not isinstance(segment_col, str))
+
+    def segmented_nps(self, mask, segment_col, ref_col_name="q7_3"):
+        """Same output as calculate_segmented_nps_with_sig on the filtered rows, for one segment column or a list."""
+        q_ref = next((col for col in self.q7_cols if col == ref_col_name.lower()), None)
+        if q_ref is None: raise ValueError(f"Reference column '{ref_col_name}' must be present.")
+        return self.segmented_comparisons(mask, segment_col).table(q_ref)
+
+    def sectional_comparisons(self, mask, max_q_num=10):
+        keep = [k for k, section in enumerate(self.section_nums) if section <= max_q_num]
+        hist = self.section_hist[mask].sum(axis=0)[keep]
+        return sectional_nps_comparisons([self.section_nums[k] for k in keep], [self.section_brands[k] for k in keep], hist)
+
+    def sectional_nps(self, mask, reference_brand="q12b_3", max_q_num=10):
+        return self.sectional_comparisons(mask, max_q_num).table(reference_brand.lower())
@@ -3,107 +3,132 @@
 import streamlit as st
 import pandas as pd
 import os
-import numpy as np
+import time
 from PIL import Image
-import io
-import gspread
-from gspread_dataframe import get_as_dataframe
 
-from mapping_utils_new import apply_mappings, connect_to_gdrive
-from utils_V2_new import (dynamic_nps_analysis, compute_tom_from_q5a, compute_dynamic_imagery, sectional_nps, calculate_segmented_nps_with_sig)
+from mapping_utils_new import connect_to_gdrive, load_mappings_from_json, get_column_mapper
+from wave_loader import load_waves
+from analytics_cube import CUBE_DIMENSIONS
+from wave_registry import WaveRegistry, WaveKey
+from wave_data import normalize_wave, wave_schema, wave_sort_key, BRAND_LINKED, PRODUCT_LINKED
+from drive_manifest import drive_manifest
+from table_render import RenderCache
+from perf_trace import Tracer, tracing, stage
+import streamlit_adapter
+
+streamlit_adapter.install()
+
+if int(pd.__version__.split('.')[0]) < 3: pd.set_option("mode.copy_on_write", True)
+
+PERF_PANEL = os.environ.get("DASHBOARD_PERF_PANEL") == "1"
+SEGMENT_LABELS = {'gender': 'Gender', 'age_group': 'Age Group', 'nccs_group': 'NCCS Group'}
 
 st.set_page_config(page_title="Newspaper Dashboard", layout="wide", page_icon="📰")
 st.markdown("""<style>.stDataFrame thead th {text-align: center;} .stDataFrame tbody td:not(:first-child) {text-align: center;}</style>""", unsafe_allow_html=True)
 
-@st.cache_data(ttl=600)
-def list_gdrive_contents(_drive_service, folder_id):
-    if _drive_service is None: return {}
-    try:
-        query = f"'{folder_id}' in parents and trashed = false"
-        results = _drive_service.files().list(q=query, fields="files(id, name, mimeType)").execute()
-        items = results.get('files', [])
-        return {item['name']: {'id': item['id'], 'type': 'folder' if item['mimeType'] == 'application/vnd.google-apps.folder' else 'file'} for item in items}
-    except Exception as e:
-        st.error(f"Could not list Google Drive contents: {e}"); return {}
+@st.cache_resource
+def get_wave_registry():
+    return WaveRegistry()
 
-@st.cache_data(ttl=600)
-def load_data(_drive_service, file_id):
-    if _drive_service is None: return None
-    try:
-        request = _drive_service.files().get_media(fileId=file_id)
-        df = pd.read_excel(io.BytesIO(request.execute()))
-        return df.dropna(how='all')
-    except Exception as e:
-        st.error(f"An error occurred while loading file ID {file_id} from Google Drive: {e}"); return None
+@st.cache_resource
+def get_render_cache():
+    return RenderCache()
 
 def display_styled_dataframe(title, calculated_df, original_df, index_col_name, filename=None, drive_service=None):
     st.subheader(title)
     if calculated_df is None or calculated_df.empty:
         st.warning(f"No data available to display for {title}."); return
-    df_mapped = apply_mappings(calculated_df, original_df, filename, drive_service=drive_service)
-    styler = None; display_df = df_mapped
-    diff_cols = [col for col in df_mapped.columns if 'minus' in str(col)]
-    if len(df_mapped) == 1 and diff_cols:
-        score_cols = [c for c in df_mapped.columns if 'minus' not in str(c) and 'Z_' not in str(c) and 'Sig_' not in str(c) and c != index_col_name]
-        scores_long = df_mapped[score_cols].melt(var_name='Newspapers', value_name='NPS Score')
-        scores_long['is_sig'] = False
-        diffs_long = df_mapped[diff_cols].melt(var_name='Newspapers', value_name='NPS Score')
-        sig_map = {col.replace('Sig_', '').replace('_vs_', '_minus_'): (df_mapped[col].iloc[0] == 'Significant') for col in df_mapped.columns if col.startswith('Sig_')}
-        diffs_long['is_sig'] = diffs_long['Newspapers'].map(sig_map).fillna(False)
-        display_df = pd.concat([scores_long, diffs_long], ignore_index=True)
-        display_df['Newspapers'] = display_df['Newspapers'].str.replace('_minus_', ' - ', regex=False)
-        styler = display_df[['Newspapers', 'NPS Score']].style.apply(style_significant_column, significance_series=display_df['is_sig'], column_to_style='NPS Score', axis=None)
-    elif diff_cols:
-        cols_to_keep = [index_col_name] + diff_cols
-        display_df = df_mapped[cols_to_keep]
-        display_df.columns = [str(c).replace('_minus_', ' - ') for c in display_df.columns]
-        styler = display_df.style.apply(style_difference_columns, full_df_with_sig_cols=df_mapped, axis=None)
-    else:
-        if 'TOM (%)' in display_df.columns and 'Brand' in display_df.columns:
-            display_df = display_df.rename(columns={'Brand': 'Newspapers', 'TOM (%)': 'TOM Score'}); score_col = 'TOM Score'
-        else: score_col = 'Score'
-        is_significant = display_df['Significance'] == 'Significant' if 'Significance' in display_df.columns else pd.Series(False, index=display_df.index)
-        styler = display_df.drop(columns=['Z Score', 'Significance'], errors='ignore').style.apply(style_significant_column, significance_series=is_significant, column_to_style=score_col, axis=None)
-    def custom_formatter(x):
-        return f"{x:.0f}" if isinstance(x, (float, int)) else x
-    cols_to_format = [c for c in styler.data.columns if c not in [index_col_name, 'Paper', 'Brand', 'Question', 'Q No.', 'Segment', 'Newspapers'] and 'Sig_' not in str(c) and 'Z_' not in str(c)]
-    st.dataframe(styler.format({col: custom_formatter for col in cols_to_format}), hide_index=True)
-
-def style_significant_column(df, significance_series, column_to_style):
-    styles = pd.DataFrame('', index=df.index, columns=df.columns)
-    if column_to_style not in df.columns: return styles
-    numeric_series = pd.to_numeric(df[column_to_style], errors='coerce')
-    styles.loc[significance_series & (numeric_series > 0), column_to_style] = 'background-color: lightgreen'
-    styles.loc[significance_series & (numeric_series < 0), column_to_style] = 'background-color: lightcoral'
-    return styles
-
-def style_difference_columns(df_to_style, full_df_with_sig_cols):
-    styler = pd.DataFrame('', index=df_to_style.index, columns=df_to_style.columns)
-    original_diff_cols = [col for col in full_df_with_sig_cols.columns if 'minus' in str(col)]
-    for original_diff_col in original_diff_cols:
-        try:
-            ref_brand, comp_brand = original_diff_col.split('_minus_')
-            sig_col_name = f"Sig_{ref_brand}_vs_{comp_brand}"
-            renamed_diff_col = original_diff_col.replace('_minus_', ' - ')
-            if sig_col_name in full_df_with_sig_cols.columns and renamed_diff_col in df_to_style.columns:
-                is_significant = full_df_with_sig_cols[sig_col_name] == 'Significant'
-                numeric_diff_series = pd.to_numeric(df_to_style[renamed_diff_col], errors='coerce')
-                styler.loc[is_significant & (numeric_diff_series > 0), renamed_diff_col] = 'background-color: lightgreen'
-                styler.loc[is_significant & (numeric_diff_series < 0), renamed_diff_col] = 'background-color: lightcoral'
-        except (IndexError, KeyError): continue
-    return styler
+    mapper = get_column_mapper(load_mappings_from_json(drive_service), filename, original_df.columns)
+    styler = get_render_cache().rendered(calculated_df, mapper, index_col_name).to_styler()
+    with stage('render.styler', 'render', title=title): st.dataframe(styler, hide_index=True)
+
+# Each tab body only runs while its tab is open; analysis(wave_key, name, **params) is memoized per (wave, filters, analysis),
+# so reopening a tab or changing the reference brand only re-slices cached comparison matrices.
+def render_nps_tab(analysis, loaded_dataframes, ref, drive_service):
+    for wave_key, wave_df in loaded_dataframes.items():
+        display_styled_dataframe(f"Wave: {wave_key}", analysis(wave_key, 'nps_comparisons').table(f"q7_{ref}"), wave_df, 'Paper', wave_key, drive_service)
+
+def render_tom_tab(analysis, loaded_dataframes, ref, drive_service):
+    for wave_key, wave_df in loaded_dataframes.items():
+        display_styled_dataframe(f"Wave: {wave_key}", analysis(wave_key, 'tom_comparisons').table(ref), wave_df, 'Brand', wave_key, drive_service)
+
+def render_imagery_tab(analysis, loaded_dataframes, ref, drive_service):
+    st.header("Brand Imagery Comparison")
+    for wave_key, wave_df in loaded_dataframes.items():
+        st.subheader(f"Results for Wave: {wave_key}")
+        full_imagery_df = analysis(wave_key, 'imagery_comparisons').table(f"q7_{ref}")
+        if not full_imagery_df.empty:
+            display_styled_dataframe("Brand Linked Imagery", full_imagery_df[full_imagery_df['Question'].isin(BRAND_LINKED)], wave_df, 'Question', wave_key, drive_service)
+            display_styled_dataframe("Product Linked Imagery", full_imagery_df[full_imagery_df['Question'].isin(PRODUCT_LINKED)], wave_df, 'Question', wave_key, drive_service)
+
+def render_segmented_tab(analysis, loaded_dataframes, ref, drive_service):
+    st.header("NPS by Segment Comparison")
+    for wave_key, wave_df in loaded_dataframes.items():
+        st.subheader(f"Analysis for Wave: {wave_key}")
+        segment_cols = [col for col in CUBE_DIMENSIONS if col in wave_df.columns]
+        if segment_cols:
+            # the widget's own state is dropped while the tab is closed, so the choice is kept under a separate key
+            choice_key = f"segment_choice_{wave_key}"
+            chosen_cols = st.multiselect("Segment NPS by", segment_cols, default=[c for c in st.session_state.get(choice_key, segment_cols) if c in segment_cols], key=f"segment_{wave_key}")
+            st.session_state[choice_key] = chosen_cols
+            if chosen_cols:
+                segmented_df = analysis(wave_key, 'segmented_comparisons', segment_col=segment_cols).table(f"q7_{ref}")
+                for segment_col in chosen_cols:
+                    segment_rows = segmented_df[segmented_df['Segmentation'] == segment_col].drop(columns='Segmentation') if not segmented_df.empty else segmented_df
+                    display_styled_dataframe(f"NPS by {SEGMENT_LABELS.get(segment_col, segment_col)}", segment_rows, wave_df, 'Segment', wave_key, drive_service)
+
+def render_sectional_tab(analysis, loaded_dataframes, ref, drive_service):
+    st.header("NPS by Section Comparison")
+    for wave_key, wave_df in loaded_dataframes.items():
+        display_styled_dataframe(f"Wave: {wave_key}", analysis(wave_key, 'sectional_comparisons').table(f"q12b_{ref}"), wave_df, 'Q No.', wave_key, drive_service)
+
+def render_trend_tab(analysis, loaded_dataframes, ref, drive_service):
+    st.header("Wave-over-Wave Trend")
+    if len(loaded_dataframes) < 2: st.info("Select at least two waves to see how scores moved between them."); return
+    trend = analysis(tuple(loaded_dataframes), 'trend')
+    wave_key, wave_df = list(loaded_dataframes.items())[-1]
+    mapper = get_column_mapper(load_mappings_from_json(drive_service), wave_key, wave_df.columns)
+    def show(title, table, score_cols):
+        st.subheader(title)
+        st.line_chart(table.set_index('Wave')[score_cols].rename(columns=mapper.column_name))
+        display_styled_dataframe(f"{title}: change vs previous wave", table, wave_df, 'Wave', wave_key, drive_service)
+    show("NPS", trend.nps_table(), trend.q7_cols)
+    if trend.tom_values: show("TOM (%)", trend.tom_table(mapper.brand_value), [mapper.brand_value(v) for v in trend.tom_values])
+    if trend.statements:
+        statement_label = lambda q_num: mapper.imagery_map.get(f"q6a.{q_num}", f"q6a.{q_num}")
+        statement = st.selectbox("Imagery statement", trend.statements, format_func=statement_label, key="trend_statement")
+        show(f"Imagery: {statement_label(statement)}", trend.imagery_table(statement), trend.q7_cols)
+    if trend.sections:
+        section_label = lambda q_num: mapper.sectional_map.get(str(q_num), str(q_num))
+        section = st.selectbox("Section", trend.sections, format_func=section_label, key="trend_section")
+        show(f"Sectional NPS: {section_label(section)}", trend.sectional_table(section), [f'q12b_{b}' for b in trend.section_brands])
+
+TAB_RENDERERS = {"NPS": render_nps_tab, "TOM": render_tom_tab, "Imagery": render_imagery_tab, "Segmented NPS": render_segmented_tab, "Sectional NPS": render_sectional_tab, "Trend": render_trend_tab}
+
+def render_perf_panel(panel, tracer):
+    """Admin view of this rerun's trace: per-stage timings, cache hit/miss counts and a Chrome-trace JSON download."""
+    with panel:
+        st.dataframe(pd.DataFrame(tracer.summary()), hide_index=True)
+        st.json(tracer.cache_stats())
+        st.download_button("Download trace (JSON)", tracer.to_json(), file_name=f"trace_{tracer.meta.get('city', 'dashboard')}_{time.strftime('%Y%m%d_%H%M%S')}.json", mime="application/json")
 
 def main_dashboard():
+    """One dashboard rerun; traced when the admin performance panel is on (DASHBOARD_PERF_PANEL=1 or ?admin=1)."""
+    tracer = Tracer() if PERF_PANEL or st.query_params.get("admin") == "1" else None
+    with tracing(tracer): _main_dashboard(tracer)
+
+def _main_dashboard(tracer):
     st.sidebar.title("Newspaper Analysis Dashboard")
     gc, drive_service = connect_to_gdrive()
     if not gc or not drive_service: st.error("Could not connect to Google Drive."); st.stop()
     
     try:
         gdrive_folder_id = st.secrets["gdrive"]["folder_id"]
-        root_contents = list_gdrive_contents(drive_service, gdrive_folder_id)
+        manifest = drive_manifest(drive_service, gdrive_folder_id); manifest.refresh()
+        root_contents = manifest.folder(gdrive_folder_id)
         data_new_folder_id = next((info['id'] for name, info in root_contents.items() if name == 'data_new' and info['type'] == 'folder'), None)
         if not data_new_folder_id: st.sidebar.error("A 'data_new' folder was not found."); st.stop()
-        cities_dict = list_gdrive_contents(drive_service, data_new_folder_id)
+        cities_dict = manifest.folder(data_new_folder_id)
         cities = sorted([name for name, info in cities_dict.items() if info['type'] == 'folder'])
         if not cities: st.sidebar.error("No city folders found."); st.stop()
     except Exception as e:
@@ -111,26 +136,24 @@ def main_dashboard():
     
     selected_city = st.sidebar.selectbox("Select City", cities)
     city_folder_id = cities_dict[selected_city]['id']
-    waves_dict = list_gdrive_contents(drive_service, city_folder_id)
-    waves = sorted([name for name, info in waves_dict.items() if info['type'] == 'file' and '.xls' in name])
+    waves_dict = manifest.folder(city_folder_id)
+    waves = sorted([name for name, info in waves_dict.items() if info['type'] == 'file' and '.xls' in name], key=wave_sort_key)
     if not waves: st.sidebar.error(f"No data files found for {selected_city}."); st.stop()
-    selected_waves = st.sidebar.multiselect("Select Waves", waves, default=waves)
+    # multiselect returns waves in the order they were picked; tabs and the trend's "vs previous wave" need wave order
+    selected_waves = sorted(st.sidebar.multiselect("Select Waves", waves, default=waves), key=waves.index)
     
-    loaded_dataframes = {}
-    if selected_waves:
-        for wave_file in selected_waves:
-            file_id = waves_dict[wave_file]['id']
-            wave_key = os.path.splitext(wave_file)[0]
-            loaded_dataframes[wave_key] = load_data(drive_service, file_id)
-    else: st.sidebar.warning("Please select at least one wave."); st.stop()
-
-    for df in loaded_dataframes.values():
-        if df is not None:
-            df.columns = [str(c).lower() for c in df.columns]
-            if 'q1a' in df.columns: df['gender'] = df['q1a'].map({1: 'Male', 2: 'Female'})
-            if 'sq1b' in df.columns: df['age_group'] = pd.cut(df['sq1b'], bins=[24, 34, 45], labels=['25–34', '35–45'], right=True)
-            sec_col = next((c for c in ['sec', 'sech_cod'] if c in df.columns), None)
-            if sec_col: df['nccs_group'] = df[sec_col].map(lambda x: 'NCCS A' if x in [1, 2, 3] else ('NCCS B+C' if x in [4, 5, 6, 7] else np.nan))
+    if not selected_waves: st.sidebar.warning("Please select at least one wave."); st.stop()
+    registry = get_wave_registry()
+    wave_keys = {os.path.splitext(wave_file)[0]: WaveKey(waves_dict[wave_file]['id'], waves_dict[wave_file].get('version')) for wave_file in selected_waves}
+    if len(wave_keys) > registry.max_waves: st.sidebar.warning(f"{len(wave_keys)} waves are selected but only {registry.max_waves} stay in memory, so some are reloaded on every rerun.")
+    # this rerun holds its own references to the frames; the registry is shared with other sessions and may evict them
+    loaded_dataframes = {wave_key: registry.get(key) for wave_key, key in wave_keys.items()}
+    missing = {wave_key: wave_keys[wave_key] for wave_key, df in loaded_dataframes.items() if df is None}
+    with stage('waves.load', 'io', waves=len(missing)): loaded_waves, load_errors = load_waves(drive_service, missing)
+    for wave_key, df in loaded_waves.items():
+        with stage('segments.derive', 'parse', wave=wave_key): loaded_dataframes[wave_key] = normalize_wave(df); registry.add(wave_keys[wave_key], loaded_dataframes[wave_key])
+    for wave_key, error in load_errors.items(): st.error(f"An error occurred while loading file ID {wave_keys[wave_key].file_id} from Google Drive: {error}")
+    loaded_dataframes = {wave_key: df for wave_key, df in loaded_dataframes.items() if df is not None}
 
     st.sidebar.subheader("Apply Filters")
     first_df = next(iter(loaded_dataframes.values()), None)
@@ -141,52 +164,31 @@ def main_dashboard():
         gender_filter = st.sidebar.selectbox("Select Gender", gender_options)
         age_filter = st.sidebar.selectbox("Select Age Group", age_options)
         nccs_filter = st.sidebar.selectbox("Select NCCS Group", nccs_options)
+        first_wave_key = next(iter(loaded_dataframes))
+        brand_options = sorted(wave_schema(first_df).q7_brands.values(), key=int) or ['3']
+        brand_label = get_column_mapper(load_mappings_from_json(drive_service), first_wave_key, first_df.columns).brand_value
+        ref = st.sidebar.selectbox("Reference Brand", brand_options, index=brand_options.index('3') if '3' in brand_options else 0, format_func=brand_label)
         
-        filtered_dataframes = {}
-        for wave_key, df in loaded_dataframes.items():
-            if df is not None:
-                filtered_df = df.copy()
-                if gender_filter != "All" and 'gender' in filtered_df.columns: filtered_df = filtered_df[filtered_df["gender"] == gender_filter]
-                if age_filter != "All" and 'age_group' in filtered_df.columns: filtered_df = filtered_df[filtered_df["age_group"] == age_filter]
-                if nccs_filter != "All" and 'nccs_group' in filtered_df.columns: filtered_df = filtered_df[filtered_df["nccs_group"] == nccs_filter]
-                filtered_dataframes[wave_key] = filtered_df
+        cache_panel = st.sidebar.expander("Cache statistics")
+        perf_panel = st.sidebar.expander("Performance trace") if tracer is not None else None
+        filters = (gender_filter, age_filter, nccs_filter)
+        def analysis(wave_key, name, **params):
+            """Memoized result for one wave; 'trend' takes a tuple of wave keys and returns their stacked WaveTrend."""
+            if name == 'trend': return registry.trend([wave_keys[k] for k in wave_key], filters, list(wave_key), [loaded_dataframes[k] for k in wave_key])
+            return registry.analysis(wave_keys[wave_key], filters, name, loaded_dataframes[wave_key], **params)
         
         st.title("📰 Newspaper Analysis Dashboard")
-        st.markdown(f"**City:** {selected_city} | **Filters:** Gender={gender_filter}, Age Group={age_filter}, NCCS={nccs_filter}")
+        st.markdown(f"**City:** {selected_city} | **Filters:** Gender={gender_filter}, Age Group={age_filter}, NCCS={nccs_filter} | **Reference:** {brand_label(ref)}")
         st.markdown("---")
 
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["NPS", "TOM", "Imagery", "Segmented NPS", "Sectional NPS"])
-        
-        with tab1:
-            for wave_key, wave_df in filtered_dataframes.items():
-                display_styled_dataframe(f"Wave: {wave_key}", dynamic_nps_analysis(wave_df, ref_col_name="q7_3"), wave_df, 'Paper', wave_key, drive_service)
-        with tab2:
-            for wave_key, wave_df in filtered_dataframes.items():
-                display_styled_dataframe(f"Wave: {wave_key}", compute_tom_from_q5a(wave_df, ref_brand='3'), wave_df, 'Brand', wave_key, drive_service)
-        with tab3:
-            st.header("Brand Imagery Comparison")
-            brand_linked = ['q6a.1', 'q6a.2', 'q6a.3', 'q6a.4', 'q6a.11', 'q6a.12', 'q6a.15', 'q6a.18']
-            product_linked = ['q6a.5', 'q6a.6', 'q6a.7', 'q6a.8', 'q6a.9', 'q6a.10', 'q6a.13', 'q6a.14', 'q6a.16', 'q6a.17']
-            for wave_key, wave_df in filtered_dataframes.items():
-                st.subheader(f"Results for Wave: {wave_key}")
-                base_counts = {col: wave_df[col].notna().sum() for col in wave_df.columns if str(col).startswith("q7_")}
-                full_imagery_df = compute_dynamic_imagery(wave_df, base_counts, ref_col_name="q7_3")
-                if not full_imagery_df.empty:
-                    display_styled_dataframe("Brand Linked Imagery", full_imagery_df[full_imagery_df['Question'].isin(brand_linked)], wave_df, 'Question', wave_key, drive_service)
-                    display_styled_dataframe("Product Linked Imagery", full_imagery_df[full_imagery_df['Question'].isin(product_linked)], wave_df, 'Question', wave_key, drive_service)
-        with tab4:
-            st.header("NPS by Segment Comparison")
-            for wave_key, wave_df in filtered_dataframes.items():
-                st.subheader(f"Analysis for Wave: {wave_key}")
-                segment_cols = [col for col in ["gender", "age_group", "nccs_group"] if col in wave_df.columns]
-                if segment_cols:
-                    segment_col = st.selectbox("Segment NPS by", segment_cols, key=f"segment_{wave_key}")
-                    if segment_col:
-                        display_styled_dataframe("NPS by Segment", calculate_segmented_nps_with_sig(wave_df, segment_col), wave_df, 'Segment', wave_key, drive_service)
-        with tab5:
-            st.header("NPS by Section Comparison")
-            for wave_key, wave_df in filtered_dataframes.items():
-                display_styled_dataframe(f"Wave: {wave_key}", sectional_nps(wave_df, reference_brand="q12b_3"), wave_df, 'Q No.', wave_key, drive_service)
+        for tab, render_tab in zip(st.tabs(list(TAB_RENDERERS), key="dashboard_tab", on_change="rerun"), TAB_RENDERERS.values()):
+            if tab.open:
+                with tab: render_tab(analysis, loaded_dataframes, ref, drive_service)
+        cache_panel.json({**registry.stats(), 'drive': manifest.stats(), 'tables': get_render_cache().stats()})
+        if tracer is not None:
+            tracer.meta.update(city=selected_city, waves=len(loaded_dataframes), respondents=int(sum(len(df) for df in loaded_dataframes.values())),
+                               filters=list(filters), reference=ref, tab=st.session_state.get("dashboard_tab"))
+            render_perf_panel(perf_panel, tracer)
 
 def login_page():
     st.title("Dashboard Login")
@@ -0,0 +1,173 @@
+# batch_reports.py
+"""Headless report builder: every dashboard tab for every wave, filter combination and reference brand of each city,
+computed on a process pool from a local copy of the Drive folder and written as one report per city.
+
+    python batch_reports.py <data_dir> <out_dir> [--cities Delhi,Pune] [--format xlsx|parquet] [--workers N]
+                            [--reference 3|1,3|all] [--mappings brand_mappings.json]
+
+data_dir mirrors the Drive root: data_new/<city>/<wave>.xlsx, plus brand_mappings.json (the fallback mappings are used
+when it is missing). Each wave is one pool task: parsed with the pruned reader through the on-disk wave cache (keyed on
+the file path, its size and mtime), reduced to a WaveCube once and sliced for every filter combination. A city's
+report is written by the pool as soon as its last wave is done. Tables are mapped the way the dashboard shows them and
+stacked per tab and reference brand, with Wave, Reference and the three filters as leading columns; each reference's
+comparison columns differ, so with several references every tab gets one sheet (or Parquet file) per reference."""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from analytics_cube import WaveCube, CUBE_DIMENSIONS
+from mapping_core import REQUIRED_MAPPING_KEYS, get_fallback_mappings, get_column_mapper, map_frame
+from wave_cache import default_wave_cache
+from wave_data import normalize_wave, wave_sort_key, BRAND_LINKED, PRODUCT_LINKED
+from wave_excel import read_wave_excel
+
+TABS = ['NPS', 'TOM', 'Imagery', 'Segmented NPS', 'Sectional NPS']
+FILTER_COLUMNS = ['Gender', 'Age Group', 'NCCS Group']
+
+def find_waves(data_dir, cities=None):
+    """{city: [(wave_key, path)]} for the .xls* files under data_dir/data_new (or data_dir itself when it is data_new)."""
+    root = os.path.join(data_dir, 'data_new') if os.path.isdir(os.path.join(data_dir, 'data_new')) else data_dir
+    found = {}
+    for city in sorted(os.listdir(root)):
+        city_dir = os.path.join(root, city)
+        if not os.path.isdir(city_dir) or (cities and city not in cities): continue
+        waves = [(os.path.splitext(name)[0], os.path.join(city_dir, name)) for name in sorted(os.listdir(city_dir), key=wave_sort_key) if '.xls' in name and not name.startswith('~$')]
+        if waves: found[city] = waves
+    return found
+
+def load_mappings(path):
+    """brand_mappings.json from path, or the fallback mappings when it is missing or lacks a required key."""
+    if path is None or not os.path.exists(path): return get_fallback_mappings()
+    with open(path) as f: mappings = json.load(f)
+    return mappings if all(key in mappings for key in REQUIRED_MAPPING_KEYS) else get_fallback_mappings()
+
+def read_local_wave(path):
+    """Parsed wave from the wave cache, keyed like a Drive file (stable ID, version) with the path standing in for both."""
+    stat = os.stat(path)
+    file_id, version = f"local_{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]}", f"{stat.st_size}:{stat.st_mtime_ns}"
+    wave_cache = default_wave_cache()
+    df = wave_cache.get(file_id, version)
+    if df is None:
+        df = read_wave_excel(path); wave_cache.put(file_id, version, df)
+    return df
+
+def filter_combinations(cube):
+    """Every (gender, age_group, nccs_group) sidebar selection the wave offers, 'All' first."""
+    return itertools.product(*[["All"] + sorted(cube.levels[dim]) if dim in cube.levels else ["All"] for dim in CUBE_DIMENSIONS])
+
+def _imagery_group(questions):
+    return questions.map(lambda q: 'Brand Linked' if q in BRAND_LINKED else ('Product Linked' if q in PRODUCT_LINKED else ''))
+
+def wave_tables(wave_key, df, mappings, references='3'):
+    """{(tab, reference): stacked table} for one parsed wave: every tab, filter combination and reference brand ('all'
+    for every brand in the wave), mapped with the wave's brand mapping."""
+    wave = normalize_wave(df)
+    cube = WaveCube(wave)
+    mapper = get_column_mapper(mappings, wave_key, wave.columns)
+    brands = sorted(cube.schema.q7_brands.values(), key=int)
+    references = brands if references == 'all' else [str(ref) for ref in references]
+    segment_cols = [dim for dim in CUBE_DIMENSIONS if dim in cube.dimensions]
+    tables = {}
+    for filters in filter_combinations(cube):
+        mask = cube.cell_mask(*filters)
+        comparisons = {'NPS': (cube.nps_comparisons(mask), 'q7_{}'), 'Imagery': (cube.imagery_comparisons(mask), 'q7_{}'), 'Sectional NPS': (cube.sectional_comparisons(mask), 'q12b_{}')}
+        if cube.tom_col is not None: comparisons['TOM'] = (cube.tom_comparisons(mask), '{}')
+        if segment_cols: comparisons['Segmented NPS'] = (cube.segmented_comparisons(mask, segment_cols), 'q7_{}')
+        for ref in references:
+            leading = {'Wave': wave_key, 'Reference': mapper.brand_value(ref), **dict(zip(FILTER_COLUMNS, filters))}
+            for tab, (comparison, ref_col) in comparisons.items():
+                table = comparison.table(ref_col.format(ref))
+                if table.empty: continue
+                if tab == 'Imagery': table = table.assign(**{'Imagery Group': _imagery_group(table['Question'])})
+                table = map_frame(table, mapper)
+                tables.setdefault((tab, ref), []).append(pd.concat([pd.DataFrame(leading, index=table.index), table], axis=1))
+    return {key: pd.concat(frames, ignore_index=True) for key, frames in tables.items()}
+
+def _wave_task(city, wave_key, path, mappings, references):
+    started = time.perf_counter()
+    df = read_local_wave(path)
+    tables = wave_tables(wave_key, df, mappings, references)
+    return city, wave_key, tables, {'Wave': wave_key, 'File': os.path.basename(path), 'Respondents': len(df), 'Seconds': round(time.perf_counter() - started, 2)}
+
+def _parquet_safe(df):
+    """Object columns mixing numbers and text (e.g. differences next to 'Insufficient base') as strings, which Parquet can hold."""
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed'): df[col] = df[col].astype('string')
+    return df
+
+def _sheet_name(tab, reference):
+    """'<tab> - <reference label>' within Excel's 31 characters and without the characters it rejects."""
+    return (tab + " - " + re.sub(r'[][:*?/\\]', '', reference))[:31]
+
+def write_report(city, wave_results, out_dir, fmt='xlsx'):
+    """Writes one city's report from [(wave_key, tables, summary)] in wave order; returns the written paths.
+    xlsx has a Waves summary sheet plus one sheet per tab, or per tab and reference when there are several references;
+    parquet is a single table with a leading Tab column, one file per reference when there are several."""
+    os.makedirs(out_dir, exist_ok=True)
+    summary = pd.DataFrame([info for _, _, info in wave_results])
+    references = list(dict.fromkeys(ref for _, tables, _ in wave_results for _, ref in tables))
+    stacked = {(tab, ref): pd.concat([tables[(tab, ref)] for _, tables, _ in wave_results if (tab, ref) in tables], ignore_index=True)
+               for ref in references for tab in TABS if any((tab, ref) in tables for _, tables, _ in wave_results)}
+    if fmt == 'parquet':
+        paths = []
+        for ref in references:
+            frame = pd.concat([table.assign(Tab=tab) for (tab, table_ref), table in stacked.items() if table_ref == ref], ignore_index=True)
+            paths.append(os.path.join(out_dir, f"{city}.parquet" if len(references) == 1 else f"{city}_ref{ref}.parquet"))
+            _parquet_safe(frame[['Tab'] + [c for c in frame.columns if c != 'Tab']]).to_parquet(paths[-1], index=False)
+        return paths
+    path = os.path.join(out_dir, f"{city}.xlsx")
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        summary.to_excel(writer, sheet_name='Waves', index=False)
+        for (tab, ref), table in stacked.items(): table.to_excel(writer, sheet_name=tab if len(references) == 1 else _sheet_name(tab, table['Reference'].iat[0]), index=False)
+    return [path]
+
+def build_reports(data_dir, out_dir, cities=None, fmt='xlsx', workers=None, references='3', mappings_path=None):
+    """Runs every wave of every city on a process pool and writes each city's report once its waves are in.
+    Returns ({city: [report paths]}, {(city, wave_key): exception})."""
+    city_waves = find_waves(data_dir, cities)
+    mappings = load_mappings(mappings_path or os.path.join(data_dir, 'brand_mappings.json'))
+    pending = {city: len(waves) for city, waves in city_waves.items()}
+    done, reports, errors = {city: {} for city in city_waves}, {}, {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(_wave_task, city, wave_key, path, mappings, references): (city, wave_key) for city, waves in city_waves.items() for wave_key, path in waves}
+        writes = {}
+        for future in as_completed(futures):
+            city, wave_key = futures[future]
+            try:
+                _, _, tables, info = future.result(); done[city][wave_key] = (wave_key, tables, info)
+                print(f"{city}/{wave_key}: {info['Respondents']} respondents in {info['Seconds']}s", file=sys.stderr)
+            except Exception as e:
+                errors[(city, wave_key)] = e; print(f"{city}/{wave_key}: failed: {e}", file=sys.stderr)
+            pending[city] -= 1
+            if pending[city] == 0 and done[city]:
+                wave_results = [done[city][wave_key] for wave_key, _ in city_waves[city] if wave_key in done[city]]
+                writes[pool.submit(write_report, city, wave_results, out_dir, fmt)] = city
+        for future in as_completed(writes):
+            city = writes[future]
+            try: reports[city] = future.result(); print(f"{city}: wrote {', '.join(reports[city])}", file=sys.stderr)
+            except Exception as e: errors[(city, None)] = e; print(f"{city}: report failed: {e}", file=sys.stderr)
+    return reports, errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('data_dir')
+    parser.add_argument('out_dir')
+    parser.add_argument('--cities', help="comma-separated city folders (default: all)")
+    parser.add_argument('--format', choices=['xlsx', 'parquet'], default='xlsx')
+    parser.add_argument('--workers', type=int, help="pool size (default: CPU count)")
+    parser.add_argument('--reference', default='3', help="reference brand number(s), comma-separated, or 'all'")
+    parser.add_argument('--mappings', help="brand_mappings.json (default: <data_dir>/brand_mappings.json)")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    references = 'all' if args.reference == 'all' else args.reference.split(',')
+    reports, errors = build_reports(args.data_dir, args.out_dir, args.cities.split(',') if args.cities else None, args.format, args.workers, references, args.mappings)
+    print(f"{len(reports)} report(s), {len(errors)} error(s) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,105 @@
+# bench_analysis.py
+"""Time and memory of every analysis on synthetic waves, for 3- and 4-brand cities at each respondent count.
+
+    python bench_analysis.py [--sizes 1000,10000,50000,200000] [--brands 3,4] [--repeat 5] [--out report.json]
+                             [--baseline old_report.json] [--tolerance 1.25]
+
+Runs offline: waves come from synthetic_survey, the row-based analyses are called uncached (the __wrapped__ functions
+behind their cache backend), apply_mappings is timed as its mapping step on the fallback mappings (no Drive), and
+the cube path is timed as cube build plus each WaveCube analysis for the unfiltered cell. Each row reports
+the median and best seconds over --repeat calls, microseconds per 1k respondents (flat across sizes when the function
+scales linearly) and the tracemalloc peak of one call in MB. With --baseline, rows slower than tolerance x the baseline
+(and by more than 5 ms) are listed and the exit status is 1."""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from synthetic_survey import SIZES, make_wave
+
+NOISE_FLOOR_SECONDS = 0.005
+
+def _cases(wave, brands):
+    """(name, zero-argument callable) for every benchmarked function on one normalized wave."""
+    import utils_V2_new as u
+    from analytics_cube import WaveCube
+    from wave_data import wave_schema
+    from mapping_core import get_fallback_mappings, get_column_mapper, map_frame
+    uncached = lambda name: getattr(u, name).__wrapped__
+    base_counts = wave_schema(wave).brand_bases(wave)
+    analyses = {'dynamic_nps_analysis': lambda: uncached('dynamic_nps_analysis')(wave),
+                'compute_tom_from_q5a': lambda: uncached('compute_tom_from_q5a')(wave, '3'),
+                'compute_dynamic_imagery': lambda: uncached('compute_dynamic_imagery')(wave, base_counts),
+                'calculate_segmented_nps_with_sig': lambda: uncached('calculate_segmented_nps_with_sig')(wave, 'gender'),
+                'sectional_nps': lambda: uncached('sectional_nps')(wave)}
+    results = {name: fn() for name, fn in analyses.items()}
+    mapper = get_column_mapper(get_fallback_mappings(), None, wave.columns)
+    cases = list(analyses.items()) + [('apply_mappings', lambda: [map_frame(df, mapper) for df in results.values()])]
+    cube = WaveCube(wave); mask = cube.cell_mask()
+    cases.append(('cube.build', lambda: WaveCube(wave)))
+    for name, params in [('nps_analysis', {}), ('tom', {'ref_brand': '3'}), ('imagery', {}), ('segmented_nps', {'segment_col': 'gender'}), ('sectional_nps', {})]:
+        cases.append((f'cube.{name}', lambda name=name, params=params: getattr(cube, name)(mask, **params)))
+    return cases
+
+def _measure(fn, repeat):
+    fn()  # warm-up: schema and mapper caches, lazy imports
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter(); fn(); seconds.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn(); peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(seconds), min(seconds), peak / 1024 / 1024
+
+def run(sizes, brand_counts, repeat):
+    from wave_data import normalize_wave
+    rows = []
+    for brands in brand_counts:
+        for n in sizes:
+            wave = normalize_wave(make_wave(n, brands=brands, seed=n))
+            for name, fn in _cases(wave, brands):
+                median, best, peak_mb = _measure(fn, repeat)
+                rows.append({'brands': brands, 'respondents': n, 'function': name, 'seconds': round(median, 5), 'best_seconds': round(best, 5),
+                             'us_per_1k_rows': round(median * 1e6 / (n / 1000), 1), 'peak_mb': round(peak_mb, 2)})
+                print(f"{brands}b {n:>7} {name:<34} {median * 1000:>9.2f} ms  {peak_mb:>8.2f} MB", file=sys.stderr)
+            del wave
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+                            'processor': platform.processor(), 'repeat': repeat}, 'results': rows}
+
+def regressions(report, baseline, tolerance):
+    """Rows of report slower than tolerance x the same (brands, respondents, function) row of baseline."""
+    previous = {(r['brands'], r['respondents'], r['function']): r['seconds'] for r in baseline['results']}
+    slower = []
+    for row in report['results']:
+        before = previous.get((row['brands'], row['respondents'], row['function']))
+        if before and row['seconds'] > before * tolerance and row['seconds'] - before > NOISE_FLOOR_SECONDS:
+            slower.append({**row, 'baseline_seconds': before, 'ratio': round(row['seconds'] / before, 2)})
+    return slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)))
+    parser.add_argument('--brands', default='3,4')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args()
+    report = run([int(n) for n in args.sizes.split(',')], [int(b) for b in args.brands.split(',')], args.repeat)
+    if args.baseline:
+        with open(args.baseline) as f: report['regressions'] = regressions(report, json.load(f), args.tolerance)
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, 'w') as f: f.write(text)
+    else: print(text)
+    if report.get('regressions'):
+        for row in report['regressions']: print(f"REGRESSION {row['brands']}b {row['respondents']} {row['function']}: {row['baseline_seconds']}s -> {row['seconds']}s (x{row['ratio']})", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,56 @@
+# bench_ingest.py
+"""Parse time and peak RSS of reading one wave workbook, full pd.read_excel vs the column-pruned reader.
+
+    python bench_ingest.py [respondents] [columns]
+
+A synthetic workbook (synthetic_survey.make_wave's question columns, padded with integer filler columns up to the requested
+width) is written once to the temp directory and reused. Each mode then parses it in a fresh interpreter: 'read_excel'
+is the old load path, 'pruned' is wave_excel.read_wave_excel. Reported numbers are wall seconds, peak RSS growth over
+the interpreter baseline (and the absolute peak) and the in-memory size of the resulting frame, in MB."""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import resource
+import subprocess
+import numpy as np
+import pandas as pd
+
+def make_workbook(n, n_cols, seed=0):
+    """Path of the synthetic n x n_cols workbook, written with openpyxl in write-only mode on first use."""
+    path = os.path.join(tempfile.gettempdir(), f"bench_wave_{n}x{n_cols}_{seed}.xlsx")
+    if os.path.exists(path): return path
+    from openpyxl import Workbook
+    from synthetic_survey import make_wave
+    wave = make_wave(n, seed=seed)
+    n_filler = max(n_cols - len(wave.columns), 0)
+    filler = np.random.default_rng(seed).integers(0, 100, (n, n_filler))
+    wb = Workbook(write_only=True); ws = wb.create_sheet()
+    ws.append(list(wave.columns) + [f"X{k}" for k in range(n_filler)])
+    for answers, extra in zip(wave.to_numpy(dtype=float), filler):
+        ws.append([None if np.isnan(v) else int(v) for v in answers] + extra.tolist())
+    wb.save(path + ".tmp"); os.replace(path + ".tmp", path)
+    return path
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run(mode, path):
+    from wave_excel import read_wave_excel
+    start, started = _peak_mb(), time.perf_counter()
+    df = pd.read_excel(path).dropna(how='all') if mode == 'read_excel' else read_wave_excel(path)
+    seconds = time.perf_counter() - started
+    print(json.dumps({'mode': mode, 'seconds': round(seconds, 1), 'peak_mb': round(_peak_mb(), 1), 'peak_growth_mb': round(_peak_mb() - start, 1),
+                      'frame_mb': round(df.memory_usage(deep=True).sum() / 1024 / 1024, 1), 'shape': list(df.shape)}))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        _run(sys.argv[2], sys.argv[3]); sys.exit()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+    path = make_workbook(n, n_cols)
+    for mode in ['read_excel', 'pruned']:
+        out = subprocess.run([sys.executable, __file__, '--mode', mode, path], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(out.stdout.strip().splitlines()[-1] if out.returncode == 0 else out.stderr)
@@ -0,0 +1,80 @@
+# bench_memory.py
+"""Peak RSS of one dashboard rerun, old pattern vs normalized waves.
+
+    python bench_memory.py [respondents] [waves]
+
+Each mode runs in a fresh interpreter: 'copy' is the old rerun (lowercase in place, df.copy() and filter every wave,
+then run the five row-based analyses); 'registry' normalizes each wave once and answers the same filters from the
+wave registry. Each filter change is one rerun; reported per rerun is its peak RSS above the RSS it started from, in MB.
+On Linux the kernel's peak counter is reset before every rerun; elsewhere only the process-wide ru_maxrss is available,
+so a rerun's figure is how far it pushed that peak past the earlier reruns' (0 when it stayed below)."""
+
+import os
+import sys
+import json
+import resource
+import subprocess
+import numpy as np
+import pandas as pd
+
+from synthetic_survey import make_wave
+
+FILTERS = [("All", "All", "All"), ("Female", "All", "All"), ("Male", "35–45", "NCCS A")]
+
+def _status_mb(field):
+    with open('/proc/self/status') as f: return next(int(line.split()[1]) for line in f if line.startswith(field + ':')) / 1024
+
+def _reset_peak():
+    """Restarts VmHWM (Linux >= 4.0); False where the counter cannot be reset."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f: f.write('5')
+        return True
+    except OSError: return False
+
+def _rerun_peak(rerun):
+    """Runs one rerun and returns its peak RSS growth in MB."""
+    if _reset_peak():
+        start = _status_mb('VmRSS'); rerun()
+        return round(_status_mb('VmHWM') - start, 1)
+    start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024; rerun()
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - start, 1)
+
+def _run(mode, n, n_waves):
+    import utils_V2_new as u
+    from wave_data import normalize_wave
+    from wave_registry import WaveRegistry, WaveKey
+    waves = {f"W{i}": make_wave(n, seed=i, filler=600) for i in range(n_waves)}
+    if mode == 'copy':
+        fns = {name: getattr(u, name).__wrapped__ for name in ['dynamic_nps_analysis', 'compute_tom_from_q5a', 'compute_dynamic_imagery', 'calculate_segmented_nps_with_sig', 'sectional_nps']}
+        for df in waves.values():
+            df.columns = [str(c).lower() for c in df.columns]
+            df['gender'] = df['q1a'].map({1: 'Male', 2: 'Female'})
+            df['age_group'] = pd.cut(df['sq1b'], bins=[24, 34, 45], labels=['25–34', '35–45'], right=True)
+            df['nccs_group'] = df['sec'].map(lambda x: 'NCCS A' if x in [1, 2, 3] else ('NCCS B+C' if x in [4, 5, 6, 7] else np.nan))
+        def rerun(gender, age, nccs):
+            for df in waves.values():
+                f = df.copy()
+                if gender != "All": f = f[f["gender"] == gender]
+                if age != "All": f = f[f["age_group"] == age]
+                if nccs != "All": f = f[f["nccs_group"] == nccs]
+                fns['dynamic_nps_analysis'](f); fns['compute_tom_from_q5a'](f, '3'); fns['sectional_nps'](f)
+                fns['compute_dynamic_imagery'](f, {c: f[c].notna().sum() for c in f.columns if c.startswith('q7_')})
+                fns['calculate_segmented_nps_with_sig'](f, 'gender')
+    else:
+        registry = WaveRegistry()
+        for wave_key, df in waves.items(): registry.add(WaveKey(wave_key, 1), normalize_wave(df))
+        def rerun(*filters):
+            for wave_key in waves:
+                for name, params in [('nps_analysis', {}), ('tom', {'ref_brand': '3'}), ('imagery', {}), ('segmented_nps', {'segment_col': 'gender'}), ('sectional_nps', {})]:
+                    registry.analysis(WaveKey(wave_key, 1), filters, name, **params)
+    peaks = [_rerun_peak(lambda: rerun(*filters)) for filters in FILTERS]
+    print(json.dumps({'mode': mode, 'rerun_peak_growth_mb': dict(zip([' / '.join(f) for f in FILTERS], peaks)), 'max_mb': max(peaks)}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        _run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4])); sys.exit()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_waves = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for mode in ['copy', 'registry']:
+        out = subprocess.run([sys.executable, __file__, '--mode', mode, str(n), str(n_waves)], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(out.stdout.strip().splitlines()[-1] if out.returncode == 0 else out.stderr)
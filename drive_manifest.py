@@ -0,0 +1,113 @@
+# drive_manifest.py
+
+import os
+import time
+import threading
+import functools
+
+from perf_trace import stage
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+FILE_FIELDS = "id, name, mimeType, modifiedTime, md5Checksum, parents, trashed"
+DEFAULT_REFRESH_SECONDS = float(os.environ.get("DRIVE_REFRESH_SECONDS", 30))
+PARENTS_PER_QUERY = 40
+PAGE_SIZE = 1000
+
+class DriveManifest:
+    """The folder tree under one Drive folder, listed once (breadth-first, several folders per query, following every
+    nextPageToken) and then kept current from the Drive changes feed, so a refresh is a single changes().list call when
+    nothing moved. Entries carry the same 'version' (md5Checksum, else modifiedTime) the wave cache is keyed on.
+    Refreshes are throttled to one per refresh_seconds; an expired change token falls back to a full re-listing."""
+
+    def __init__(self, drive_service, root_id, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.drive_service, self.root_id, self.refresh_seconds = drive_service, root_id, refresh_seconds
+        self._lock = threading.RLock()
+        self._items, self._children = {}, {}
+        self._page_token, self._refreshed = None, 0.0
+        self.requests = 0
+
+    def _execute(self, request):
+        self.requests += 1
+        return request.execute()
+
+    def _list_children(self, folder_ids):
+        """Every child of the given folders, OR-ing up to PARENTS_PER_QUERY parents into each files().list query."""
+        items = []
+        for start in range(0, len(folder_ids), PARENTS_PER_QUERY):
+            parents = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids[start:start + PARENTS_PER_QUERY])
+            query = f"({parents}) and trashed = false"
+            page_token = None
+            while True:
+                page = self._execute(self.drive_service.files().list(q=query, fields=f"nextPageToken, files({FILE_FIELDS})", pageSize=PAGE_SIZE, pageToken=page_token))
+                items.extend(page.get('files', []))
+                page_token = page.get('nextPageToken')
+                if not page_token: break
+        return items
+
+    def _walk(self, folder_ids):
+        while folder_ids:
+            children = self._list_children(folder_ids)
+            folder_ids = [item['id'] for item in children if self._add(item) and item['mimeType'] == FOLDER_MIME_TYPE]
+
+    def _add(self, item):
+        """Records item under its tracked parent; returns False when none of its parents is in the tree."""
+        parent_id = next((p for p in item.get('parents', []) if p in self._children), None)
+        if parent_id is None: return False
+        previous = self._items.get(item['id'])
+        if previous is not None: self._children[previous['parent']].pop(item['id'], None)
+        self._items[item['id']] = {'id': item['id'], 'name': item['name'], 'parent': parent_id, 'type': 'folder' if item['mimeType'] == FOLDER_MIME_TYPE else 'file',
+                                   'version': item.get('md5Checksum') or item.get('modifiedTime')}
+        self._children.setdefault(parent_id, {})[item['id']] = None
+        if item['mimeType'] == FOLDER_MIME_TYPE: self._children.setdefault(item['id'], {})
+        return True
+
+    def _remove(self, item_id):
+        entry = self._items.pop(item_id, None)
+        if entry is None: return
+        self._children.get(entry['parent'], {}).pop(item_id, None)
+        for child_id in list(self._children.pop(item_id, {})): self._remove(child_id)
+
+    def _rebuild(self):
+        self._page_token = self._execute(self.drive_service.changes().getStartPageToken())['startPageToken']
+        self._items, self._children = {}, {self.root_id: {}}
+        self._walk([self.root_id])
+
+    def _apply_changes(self):
+        new_folders, token = [], self._page_token
+        while True:
+            page = self._execute(self.drive_service.changes().list(pageToken=token, fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))", pageSize=PAGE_SIZE))
+            for change in page.get('changes', []):
+                item = change.get('file')
+                if change.get('removed') or item is None or item.get('trashed'): self._remove(change['fileId']); continue
+                known = item['id'] in self._children
+                if not self._add(item): self._remove(item['id'])
+                elif item['mimeType'] == FOLDER_MIME_TYPE and not known: new_folders.append(item['id'])
+            if 'newStartPageToken' in page:
+                self._page_token = page['newStartPageToken']; break
+            token = page['nextPageToken']
+        self._walk(new_folders)
+
+    def refresh(self, force=False):
+        """Brings the tree up to date: a full listing on first use, otherwise the changes since the last refresh."""
+        with self._lock:
+            if not force and self._page_token is not None and time.monotonic() - self._refreshed < self.refresh_seconds: return
+            with stage('drive.refresh', 'io', full=self._page_token is None):
+                if self._page_token is None: self._rebuild()
+                else:
+                    try: self._apply_changes()
+                    except Exception: self._rebuild()
+            self._refreshed = time.monotonic()
+
+    def folder(self, folder_id):
+        """{name: {'id', 'type', 'version'}} for the children of folder_id."""
+        with self._lock:
+            if self._page_token is None: self.refresh()
+            return {self._items[child_id]['name']: {key: self._items[child_id][key] for key in ('id', 'type', 'version')} for child_id in self._children.get(folder_id, {})}
+
+    def stats(self):
+        with self._lock: return {'items': len(self._items), 'folders': len(self._children), 'requests': self.requests}
+
+@functools.lru_cache(maxsize=8)
+def drive_manifest(drive_service, root_id):
+    """The shared manifest for this Drive client and root folder."""
+    return DriveManifest(drive_service, root_id)
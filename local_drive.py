@@ -0,0 +1,116 @@
+# local_drive.py
+
+import os
+import re
+import hashlib
+import datetime
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+class _Request:
+    def __init__(self, fn): self._fn = fn
+    def execute(self, http=None, num_retries=0): return self._fn()
+
+class _Files:
+    def __init__(self, service): self._service = service
+
+    def list(self, q=None, fields=None, pageSize=None, pageToken=None, **kwargs):
+        return _Request(lambda: self._service._page(self._service._list(q), 'files', pageSize, pageToken))
+
+    def get(self, fileId, fields=None, **kwargs):
+        return _Request(lambda: self._service._metadata(fileId))
+
+    def get_media(self, fileId, **kwargs):
+        return _Request(lambda: self._service._read(fileId))
+
+class _Changes:
+    def __init__(self, service): self._service = service
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(lambda: {'startPageToken': self._service._start_token()})
+
+    def list(self, pageToken, fields=None, pageSize=None, **kwargs):
+        return _Request(lambda: self._service._changes(pageToken, pageSize))
+
+class LocalDriveService:
+    """Stand-in for the Drive v3 client that serves a local directory, for tests and offline runs.
+    File IDs are paths relative to root ('' is the root folder). Supports the subset of files().list/get/get_media the
+    dashboard uses: "'<id>' in parents" (several joined by 'or'), "name='<name>'" and "trashed=false" query terms, with
+    pageSize/pageToken paging (page_size caps every page, so tests can force pagination).
+    changes() emulates the Drive changes feed: each call rescans the tree and logs the files added, modified or removed
+    since the previous scan; page tokens are positions in that log."""
+
+    def __init__(self, root, page_size=100):
+        self.root = os.path.abspath(root)
+        self.page_size = page_size
+        self._snapshot, self._log = None, []
+
+    def files(self): return _Files(self)
+
+    def changes(self): return _Changes(self)
+
+    def _page(self, items, key, page_size, page_token):
+        start = int(page_token or 0)
+        end = start + min(page_size or self.page_size, self.page_size)
+        page = {key: items[start:end]}
+        if end < len(items): page['nextPageToken'] = str(end)
+        return page
+
+    def _path(self, file_id):
+        path = os.path.abspath(os.path.join(self.root, file_id))
+        if os.path.commonpath([path, self.root]) != self.root: raise FileNotFoundError(file_id)
+        return path
+
+    def _metadata(self, file_id):
+        path = self._path(file_id)
+        stat = os.stat(path)
+        item = {'id': file_id, 'name': os.path.basename(path) or os.path.basename(self.root), 'parents': [os.path.dirname(file_id)] if file_id else [],
+                'modifiedTime': datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc).isoformat().replace('+00:00', 'Z')}
+        if os.path.isdir(path): item['mimeType'] = FOLDER_MIME_TYPE
+        else:
+            with open(path, 'rb') as f: item['md5Checksum'] = hashlib.md5(f.read()).hexdigest()
+            item['mimeType'] = 'application/octet-stream'
+        return item
+
+    def _list(self, q):
+        parent_ids = re.findall(r"'([^']*)' in parents", q or "") or ['']
+        name = re.search(r"name\s*=\s*'([^']*)'", q or "")
+        items = []
+        for parent_id in parent_ids:
+            folder = self._path(parent_id)
+            children = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+            if name: children = [c for c in children if c == name.group(1)]
+            items.extend(self._metadata(os.path.join(parent_id, c) if parent_id else c) for c in children)
+        return items
+
+    def _scan(self):
+        snapshot = {}
+        for folder, dirs, files in os.walk(self.root):
+            for name in dirs + files:
+                file_id = os.path.relpath(os.path.join(folder, name), self.root)
+                stat = os.stat(os.path.join(folder, name))
+                snapshot[file_id] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _record_changes(self):
+        snapshot = self._scan()
+        if self._snapshot is not None:
+            for file_id in sorted(set(snapshot) | set(self._snapshot), key=lambda f: (f.count(os.sep), f)):
+                if file_id not in snapshot: self._log.append({'fileId': file_id, 'removed': True})
+                elif snapshot[file_id] != self._snapshot.get(file_id): self._log.append({'fileId': file_id, 'removed': False, 'file': self._metadata(file_id)})
+        self._snapshot = snapshot
+
+    def _start_token(self):
+        self._record_changes()
+        return str(len(self._log))
+
+    def _changes(self, page_token, page_size):
+        self._record_changes()
+        start = int(page_token)
+        page = self._page(self._log[start:], 'changes', page_size, 0)
+        if 'nextPageToken' in page: page['nextPageToken'] = str(start + int(page['nextPageToken']))
+        else: page['newStartPageToken'] = str(len(self._log))
+        return page
+
+    def _read(self, file_id):
+        with open(self._path(file_id), 'rb') as f: return f.read()
@@ -0,0 +1,83 @@
+# mapping_core.py
+
+import re
+import json
+import hashlib
+import functools
+
+REQUIRED_MAPPING_KEYS = ["brand_mappings", "imagery_mappings", "sectional_mappings"]
+
+def get_fallback_mappings():
+    return {"brand_mappings": {"fallback_3_brand": {'q7_1': 'AU', 'q7_2': 'DJ', 'q7_3': 'HH', '1': 'AU', '2': 'DJ', '3': 'HH', 'Q12b_1': 'AU', 'Q12b_2': 'DJ', 'Q12b_3': 'HH'}, "fallback_4_brand": {'q7_1': 'DB', 'q7_2': 'DJ', 'q7_3': 'HH', 'q7_4': 'PK', '1': 'DB', '2': 'DJ', '3': 'HH', '4': 'PK', 'Q12b_1': 'DB', 'Q12b_2': 'DJ', 'Q12b_3': 'HH', 'Q12b_4': 'PK'}}, "imagery_mappings": {'Q6a.1': 'City Paper', 'Q6a.2': 'Market Leader', 'Q6a.3': 'Trustworthy', 'Q6a.4': 'Buzz (Charcha)', 'Q6a.5': 'Good quantum', 'Q6a.6': 'Latest local news', 'Q6a.7': 'Raises issues/ concerns', 'Q6a.8': 'Changes with time', 'Q6a.9': 'Complete analysis', 'Q6a.10': 'Appeals to Everyone', 'Q6a.11': 'Good Discount / Good Schemes', 'Q6a.12': 'Unbiased and bold', 'Q6a.13': 'Best On Education And Employment', 'Q6a.14': 'Content different from other newspapers', 'Q6a.15': 'Brand is Ready for Future', 'Q6a.16': 'Appeals Youth', 'Q6a.17': 'Offers News in both Print & Digital formats', 'Q6a.18': 'Premium Brand'}, "sectional_mappings": {'1': 'Front Page', '2': 'State Polit', '3': 'Local', '4': 'Education/Campus', '5': 'Nearby (Aaspaas)', '6': 'State/Pradesh', '7': 'Business', '8': 'International news', '9': 'National News', '10': 'Sports'}}
+
+def get_brand_mapping_from_filename(filename, mappings_data):
+    clean_filename = filename.replace('.xlsx', '') if filename else filename
+    if not clean_filename or not mappings_data: return None
+    brand_mappings = mappings_data.get("brand_mappings", {})
+    if clean_filename in brand_mappings: return brand_mappings[clean_filename]
+    for key in brand_mappings:
+        if key in clean_filename or clean_filename in key: return brand_mappings[key]
+    return None
+
+class ColumnMapper:
+    """Brand, imagery and sectional renames compiled once per mappings version and brand map.
+    Column names go through a single case-insensitive alternation (longest key first) and each translated name is
+    memoized; cell values are looked up in the lowercase maps. version identifies the maps, for keying rendered output."""
+
+    def __init__(self, brand_map, imagery_map, sectional_map):
+        self.brand_map = {k.lower(): v for k, v in brand_map.items()}
+        self.imagery_map = {k.lower(): v for k, v in imagery_map.items()}
+        self.sectional_map = {k.lower(): v for k, v in sectional_map.items()}
+        self.full_map = {**self.brand_map, **self.imagery_map, **self.sectional_map}
+        sorted_keys = sorted(self.full_map.keys(), key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(key) for key in sorted_keys), flags=re.IGNORECASE) if sorted_keys else None
+        self._column_names, self._brand_values = {}, {}
+        self.version = hashlib.sha1(json.dumps([self.brand_map, self.imagery_map, self.sectional_map], sort_keys=True).encode()).hexdigest()[:16]
+
+    def column_name(self, col_name):
+        new_name = self._column_names.get(col_name)
+        if new_name is None:
+            new_name = str(col_name)
+            if self.pattern is not None: new_name = self.pattern.sub(lambda m: self.full_map[m.group(0).lower()], new_name)
+            self._column_names[col_name] = new_name
+        return new_name
+
+    def brand_value(self, value):
+        s_val = str(value).strip()
+        mapped = self._brand_values.get(s_val)
+        if mapped is None:
+            if ' - ' in s_val: mapped = ' - '.join(self.brand_map.get(p.strip().lower(), p.strip()) for p in s_val.split(' - '))
+            else: mapped = self.brand_map.get(s_val.lower(), s_val)
+            self._brand_values[s_val] = mapped
+        return mapped
+
+@functools.lru_cache(maxsize=64)
+def _compile_mapper(mappings_json, filename, is_4_brand):
+    mappings_data = json.loads(mappings_json)
+    brand_map_to_use = get_brand_mapping_from_filename(filename, mappings_data)
+    if brand_map_to_use is None:
+        fallback_mappings = mappings_data["brand_mappings"]
+        brand_map_to_use = fallback_mappings.get("fallback_4_brand" if is_4_brand else "fallback_3_brand", {})
+    return ColumnMapper(brand_map_to_use, mappings_data["imagery_mappings"], mappings_data["sectional_mappings"])
+
+def get_column_mapper(mappings_data, filename, original_columns):
+    """Returns the compiled mapper for this mappings version and file; the 3/4-brand check only runs without a filename match."""
+    is_4_brand = None
+    if get_brand_mapping_from_filename(filename, mappings_data) is None:
+        is_4_brand = any(str(col).lower().strip().startswith('q7_4') for col in original_columns)
+    return _compile_mapper(json.dumps(mappings_data, sort_keys=True), filename, is_4_brand)
+
+def _map_values(series, lookup):
+    keys = series.astype(str).str.strip().str.lower()
+    mapped = keys.map(lookup)
+    return mapped.where(mapped.notna(), series)
+
+def map_frame(df, mapper):
+    """df with the mapper's column renames and Paper/Brand/Question/Q No. value renames applied."""
+    if df.empty: return df
+    df_mapped = df.rename(columns={col_name: mapper.column_name(col_name) for col_name in df.columns})
+    for col_name in ['Paper', 'Brand']:
+        if col_name in df_mapped.columns: df_mapped[col_name] = df_mapped[col_name].map(mapper.brand_value)
+    if 'Question' in df_mapped.columns: df_mapped['Question'] = _map_values(df_mapped['Question'], mapper.imagery_map)
+    if 'Q No.' in df_mapped.columns: df_mapped['Q No.'] = _map_values(df_mapped['Q No.'].astype(str), mapper.sectional_map)
+    return df_mapped
@@ -0,0 +1,89 @@
+# perf_trace.py
+
+import os
+import json
+import time
+import threading
+import contextlib
+import contextvars
+import resource
+from collections import Counter
+
+_active = contextvars.ContextVar('perf_tracer', default=None)
+
+def _rss_mb():
+    """Current resident set size in MB (Linux /proc), else the peak so far."""
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Tracer:
+    """Spans and cache counters for one dashboard rerun. Spans carry wall time and the RSS change across the stage and
+    export as Chrome trace events (chrome://tracing, Perfetto); cache lookups are counted per cache as hits and misses.
+    Worker threads report into the tracer active in the context they were submitted from."""
+
+    def __init__(self, **meta):
+        self.meta = dict(meta)
+        self.events, self.caches = [], {}
+        self._t0 = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, cat='stage', **args):
+        start, rss = time.perf_counter_ns(), _rss_mb()
+        try: yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': (start - self._t0) / 1000, 'dur': (end - start) / 1000,
+                     'pid': os.getpid(), 'tid': threading.get_ident(), 'args': {**args, 'rss_delta_mb': round(_rss_mb() - rss, 2)}}
+            with self._lock: self.events.append(event)
+
+    def cache(self, name, hit):
+        with self._lock: self.caches.setdefault(name, Counter())['hits' if hit else 'misses'] += 1
+
+    def summary(self):
+        """Per-stage rows (calls, total/max ms, summed RSS change), slowest first."""
+        stages = {}
+        with self._lock: events = list(self.events)
+        for event in events:
+            row = stages.setdefault(event['name'], {'stage': event['name'], 'category': event['cat'], 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rss_delta_mb': 0.0})
+            row['calls'] += 1; row['total_ms'] += event['dur'] / 1000; row['max_ms'] = max(row['max_ms'], event['dur'] / 1000)
+            row['rss_delta_mb'] += event['args']['rss_delta_mb']
+        return sorted(({**row, 'total_ms': round(row['total_ms'], 2), 'max_ms': round(row['max_ms'], 2), 'rss_delta_mb': round(row['rss_delta_mb'], 2)} for row in stages.values()), key=lambda row: -row['total_ms'])
+
+    def cache_stats(self):
+        with self._lock: return {name: dict(counts) for name, counts in self.caches.items()}
+
+    def chrome_trace(self):
+        with self._lock: events = list(self.events)
+        metadata = {**self.meta, 'caches': self.cache_stats(), 'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        return {'traceEvents': sorted(events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms', 'metadata': metadata}
+
+    def to_json(self):
+        return json.dumps(self.chrome_trace(), default=str)
+
+@contextlib.contextmanager
+def tracing(tracer):
+    """Makes tracer the active one for this context (None disables tracing)."""
+    token = _active.set(tracer)
+    try: yield tracer
+    finally: _active.reset(token)
+
+def stage(name, cat='stage', **args):
+    """Span in the active tracer; a no-op context when tracing is off."""
+    tracer = _active.get()
+    return tracer.span(name, cat, **args) if tracer is not None else contextlib.nullcontext()
+
+def cache_event(name, hit):
+    tracer = _active.get()
+    if tracer is not None: tracer.cache(name, hit)
+
+def probe_cache_data(name, cached_fn, *args, **kwargs):
+    """Calls an st.cache_data function and records a hit unless its body reported a miss (cache_event(name, False))."""
+    tracer = _active.get()
+    if tracer is None: return cached_fn(*args, **kwargs)
+    misses = tracer.cache_stats().get(name, {}).get('misses', 0)
+    result = cached_fn(*args, **kwargs)
+    if tracer.cache_stats().get(name, {}).get('misses', 0) == misses: tracer.cache(name, True)
+    return result
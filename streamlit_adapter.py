@@ -0,0 +1,24 @@
+# streamlit_adapter.py
+
+import logging
+import streamlit as st
+
+from analysis_cache import set_cache_backend
+
+CORE_LOGGERS = ['utils_V2_new']
+
+class _StreamlitWarnings(logging.Handler):
+    """Shows warnings the core analytics log (e.g. a missing TOM reference brand) as st.warning boxes."""
+
+    def emit(self, record):
+        st.warning(record.getMessage())
+
+_handler = _StreamlitWarnings(logging.WARNING)
+
+def install():
+    """Binds the Streamlit-free core to this app: @cached analyses go through st.cache_data and core warnings show in
+    the page. Safe to call on every rerun."""
+    set_cache_backend(st.cache_data)
+    for name in CORE_LOGGERS:
+        core_logger = logging.getLogger(name)
+        if _handler not in core_logger.handlers: core_logger.addHandler(_handler)
@@ -0,0 +1,48 @@
+# synthetic_survey.py
+"""Synthetic wave workbooks for offline benchmarking: the q1a/sq1b/sec/q5a/q6a/q7/q12b columns of a 3- or 4-brand
+city, with brand-dependent awareness, NPS and imagery so every comparison has real differences to find.
+
+    from synthetic_survey import make_wave, make_city
+    wave = make_wave(50000, brands=3, seed=1)"""
+
+import numpy as np
+import pandas as pd
+
+SIZES = [1000, 10000, 50000, 200000]
+IMAGERY_STATEMENTS = 18
+SECTIONS = 10
+
+def _brand_profile(brands, rng):
+    """Per-brand readership share, awareness (q7 answered) and mean rating quality, strongest brand first."""
+    share = np.sort(rng.dirichlet(np.full(brands, 2.0)))[::-1]
+    awareness = np.clip(0.45 + share, 0.4, 0.95)
+    quality = np.clip(0.62 + 0.25 * (share - share.mean()) + rng.normal(0, 0.03, brands), 0.4, 0.9)
+    return share, awareness, quality
+
+def make_wave(n, brands=4, seed=0, filler=0, city_seed=None):
+    """One wave of n respondents with the raw (mixed-case) column names of a client workbook. Waves sharing a city_seed
+    share their brand profile (defaults to seed); filler adds that many unused float columns (X0, X1, ...), as the wide
+    real exports carry."""
+    rng = np.random.default_rng(seed)
+    share, awareness, quality = _brand_profile(brands, np.random.default_rng(seed if city_seed is None else city_seed))
+    data = {'Q1a': rng.integers(1, 3, n), 'SQ1b': rng.integers(25, 46, n), 'SEC': rng.integers(1, 9, n)}
+    data['Q5a_1'] = np.where(rng.random(n) < 0.05, np.nan, rng.choice(np.arange(1, brands + 1), n, p=share))
+    aware = rng.random((n, brands)) < awareness
+    affinity = rng.normal(0, 0.08, n)[:, None]
+    ratings = rng.binomial(10, np.clip(quality + affinity, 0.05, 0.95))
+    for b in range(brands): data[f'Q7_{b + 1}'] = np.where(aware[:, b], ratings[:, b], np.nan)
+    statement_level = rng.uniform(0.2, 0.6, IMAGERY_STATEMENTS)
+    for s in range(IMAGERY_STATEMENTS):
+        agree = rng.random((n, brands)) < np.clip(statement_level[s] + 0.6 * (ratings / 10 - 0.6), 0.02, 0.98)
+        for b in range(brands): data[f'Q6a.{s + 1}.{b + 1}'] = np.where(aware[:, b] & (rng.random(n) < 0.9), agree[:, b], np.nan)
+    reads = aware & (rng.random((n, brands)) < 0.6)
+    for b in range(brands):
+        section_quality = np.clip(quality[b] + rng.normal(0, 0.05, SECTIONS), 0.05, 0.95)
+        scores = rng.binomial(10, np.broadcast_to(section_quality, (n, SECTIONS)))
+        for s in range(SECTIONS): data[f'Q12b_{b + 1}_{s + 1}'] = np.where(reads[:, b], scores[:, s], np.nan)
+    for k in range(filler): data[f'X{k}'] = rng.random(n)
+    return pd.DataFrame(data)
+
+def make_city(n, brands=4, waves=3, seed=0, filler=0):
+    """{wave name: frame} for consecutive waves of one city, each with its own sample."""
+    return {f"W{i + 1}": make_wave(n, brands, seed=seed * 1000 + i, filler=filler, city_seed=seed) for i in range(waves)}
@@ -0,0 +1,108 @@
+# table_render.py
+
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+
+from mapping_core import map_frame
+from perf_trace import stage, cache_event
+
+SIGNIFICANT_UP, SIGNIFICANT_DOWN = 'background-color: lightgreen', 'background-color: lightcoral'
+LABEL_COLUMNS = ['Paper', 'Brand', 'Question', 'Q No.', 'Segment', 'Newspapers', 'Wave']
+
+class RenderedTable(namedtuple('RenderedTable', ['data', 'css', 'number_cols'])):
+    """A display-ready table: the frame to show, its CSS as a same-shape frame of strings, and the columns whose numbers
+    are shown without decimals. to_styler() wraps it in a fresh Styler, so a cached table is never shared mutably."""
+
+    def to_styler(self):
+        css = self.css
+        return self.data.style.apply(lambda _: css, axis=None).format(precision=0, subset=self.number_cols)
+
+def result_digest(df):
+    """Content hash of an analysis result. Hashes its pickle, which is ~10x cheaper than hash_pandas_object on these
+    mixed-type frames; equal frames with a different block layout only cost a cache miss."""
+    return hashlib.sha1(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+def highlight_css(values, significant):
+    """Whole-array highlight: green where significant and positive, red where significant and negative."""
+    numbers = pd.to_numeric(pd.Series(np.asarray(values, dtype=object).ravel()), errors='coerce').to_numpy().reshape(np.shape(values))
+    significant = np.asarray(significant, dtype=bool)
+    return np.where(significant & (numbers > 0), SIGNIFICANT_UP, np.where(significant & (numbers < 0), SIGNIFICANT_DOWN, ''))
+
+def _comparison_pairs(columns):
+    """(diff column, Sig column or None) for every '<ref>_minus_<comp>' column, paired on the unmapped names."""
+    columns = [str(c) for c in columns]
+    pairs = []
+    for col in columns:
+        if '_minus_' not in col: continue
+        ref, comp = col.split('_minus_', 1)
+        sig_col = f"Sig_{ref}_vs_{comp}"
+        pairs.append((col, sig_col if sig_col in columns else None))
+    return pairs
+
+def _significance_matrix(df, sig_cols):
+    significant = np.zeros((len(df), len(sig_cols)), dtype=bool)
+    present = [j for j, col in enumerate(sig_cols) if col is not None]
+    if present: significant[:, present] = df[[sig_cols[j] for j in present]].to_numpy() == 'Significant'
+    return significant
+
+def render_table(calculated_df, mapper, index_col_name):
+    """The RenderedTable display_styled_dataframe shows for one analysis result: a single-row comparison becomes a long
+    score list, other comparison tables keep only their differences, and TOM-style tables highlight their score column."""
+    pairs = _comparison_pairs(calculated_df.columns)
+    with stage('mappings.apply', 'render'): df_mapped = map_frame(calculated_df, mapper)
+    name = lambda col: mapper.column_name(col).replace('_minus_', ' - ')
+    if pairs:
+        diff_cols, sig_cols = [c for c, _ in pairs], [s for _, s in pairs]
+        significant = _significance_matrix(calculated_df, sig_cols)
+        diffs = calculated_df[diff_cols].to_numpy(dtype=object)
+        if len(calculated_df) == 1:
+            score_cols = [c for c in calculated_df.columns if 'minus' not in str(c) and 'Z_' not in str(c) and 'Sig_' not in str(c) and mapper.column_name(c) != index_col_name]
+            data = pd.DataFrame({'Newspapers': [name(c) for c in score_cols + diff_cols],
+                                 'NPS Score': list(calculated_df[score_cols].to_numpy(dtype=object)[0]) + list(diffs[0])})
+            css = np.concatenate([np.full(len(score_cols), ''), highlight_css(diffs[0], significant[0])])
+            css = np.column_stack([np.full(len(data), ''), css])
+        else:
+            data = df_mapped[[index_col_name] + [mapper.column_name(c) for c in diff_cols]]
+            data.columns = [index_col_name] + [name(c) for c in diff_cols]
+            css = np.column_stack([np.full(len(data), ''), highlight_css(diffs, significant)])
+    else:
+        data, score_col = df_mapped, 'Score'
+        if 'TOM (%)' in data.columns and 'Brand' in data.columns:
+            data = data.rename(columns={'Brand': 'Newspapers', 'TOM (%)': 'TOM Score'}); score_col = 'TOM Score'
+        significant = (data['Significance'] == 'Significant').to_numpy() if 'Significance' in data.columns else np.zeros(len(data), dtype=bool)
+        data = data.drop(columns=['Z Score', 'Significance'], errors='ignore')
+        css = np.full(data.shape, '', dtype=object)
+        if score_col in data.columns: css[:, data.columns.get_loc(score_col)] = highlight_css(data[score_col].to_numpy(dtype=object), significant)
+    css = pd.DataFrame(css, index=data.index, columns=data.columns)
+    number_cols = [c for c in data.columns if c not in [index_col_name] + LABEL_COLUMNS and 'Sig_' not in str(c) and 'Z_' not in str(c)]
+    return RenderedTable(data, css, number_cols)
+
+class RenderCache:
+    """LRU of RenderedTables keyed by (analysis result digest, index column, mapping version)."""
+
+    def __init__(self, max_tables=512):
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def rendered(self, calculated_df, mapper, index_col_name):
+        key = (result_digest(calculated_df), index_col_name, mapper.version)
+        with self._lock:
+            cache_event('render_cache', key in self._tables)
+            if key in self._tables:
+                self.hits += 1; self._tables.move_to_end(key)
+                return self._tables[key]
+            self.misses += 1
+        with stage('render.table', 'render', index=index_col_name): table = render_table(calculated_df, mapper, index_col_name)
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_tables: self._tables.popitem(last=False)
+        return table
+
+    def stats(self):
+        with self._lock: return {'tables': len(self._tables), 'hits': self.hits, 'misses': self.misses}
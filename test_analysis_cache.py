@@ -0,0 +1,28 @@
+# test_analysis_cache.py
+
+import pandas as pd
+
+from analysis_cache import MemoryCache
+
+def test_cached_frames_survive_caller_edits():
+    calls = []
+    @MemoryCache()
+    def table(df):
+        calls.append(1)
+        return pd.DataFrame({'Brand': ['A', 'B'], 'NPS': [10.0, 20.0]})
+    df = pd.DataFrame({'q7_1': [1, 2]})
+    first = table(df)
+    first['NPS'] = first['NPS'] * 2
+    first.rename(columns={'Brand': 'Paper'}, inplace=True)
+    second = table(df)
+    assert len(calls) == 1
+    assert list(second.columns) == ['Brand', 'NPS'] and second['NPS'].tolist() == [10.0, 20.0]
+    second.loc[0, 'NPS'] = -1.0
+    assert table(df)['NPS'].tolist() == [10.0, 20.0]
+
+def test_a_new_frame_is_a_new_key():
+    cache = MemoryCache()
+    wrapped = cache(lambda df, ref: (len(df), ref))
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    assert wrapped(df, 'q7_3') == (3, 'q7_3')
+    assert wrapped(pd.DataFrame({'a': [1]}), 'q7_3') == (1, 'q7_3')
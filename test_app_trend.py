@@ -0,0 +1,42 @@
+# test_app_trend.py
+
+import json
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import mapping_utils_new
+import wave_loader
+from local_drive import LocalDriveService
+from synthetic_survey import make_wave
+from wave_cache import WaveCache
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The dashboard over a local Drive folder holding Delhi waves W1, W2 and W10."""
+    drive = tmp_path / "drive"
+    (drive / "data_new" / "Delhi").mkdir(parents=True)
+    (drive / "brand_mappings.json").write_text(json.dumps({"brand_mappings": {"W": {"q7_1": "DB", "q7_2": "DJ", "q7_3": "HH", "1": "DB", "2": "DJ", "3": "HH"}}, "imagery_mappings": {}, "sectional_mappings": {}}))
+    for k in (1, 2, 10): make_wave(300, brands=3, seed=k, city_seed=0).to_excel(drive / "data_new" / "Delhi" / f"W{k}.xlsx", index=False)
+    service, cache = LocalDriveService(drive), WaveCache(tmp_path / "cache")
+    monkeypatch.setattr(mapping_utils_new, 'connect_to_gdrive', lambda: (object(), service))
+    monkeypatch.setattr(wave_loader, 'default_wave_cache', lambda: cache)
+    at = AppTest.from_file("app_3_new.py", default_timeout=120)
+    at.secrets['gdrive'] = {'folder_id': ''}
+    at.session_state['authenticated'] = True
+    return at
+
+def _trend_waves(at):
+    at.session_state['dashboard_tab'] = 'Trend'; at.run()
+    assert not at.exception
+    return [table.value['Wave'].tolist() for table in at.dataframe]
+
+def test_waves_are_in_wave_order(app):
+    app.run()
+    assert app.sidebar.multiselect[0].value == ['W1.xlsx', 'W2.xlsx', 'W10.xlsx']
+    assert all(waves == ['W1', 'W2', 'W10'] for waves in _trend_waves(app))
+
+def test_trend_keeps_wave_order_whatever_the_selection_order(app):
+    app.run()
+    app.sidebar.multiselect[0].set_value(['W10.xlsx', 'W2.xlsx', 'W1.xlsx'])
+    tables = _trend_waves(app)
+    assert tables and all(waves == ['W1', 'W2', 'W10'] for waves in tables)
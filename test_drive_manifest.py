@@ -0,0 +1,72 @@
+# test_drive_manifest.py
+
+import os
+import pytest
+
+from drive_manifest import DriveManifest
+from local_drive import LocalDriveService
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+@pytest.fixture
+def drive(tmp_path):
+    for name in ["W0", "W1", "W2", "W3", "W4"]: _write(tmp_path / "data_new" / "Delhi" / f"{name}.xlsx", name.encode())
+    _write(tmp_path / "data_new" / "Pune" / "W1.xlsx", b"pune")
+    _write(tmp_path / "brand_mappings.json", b"{}")
+    return LocalDriveService(tmp_path, page_size=2)
+
+def _tree(manifest, folder_id=''):
+    """{name: version or subtree} for everything under folder_id."""
+    return {name: _tree(manifest, entry['id']) if entry['type'] == 'folder' else entry['version'] for name, entry in manifest.folder(folder_id).items()}
+
+def test_full_listing_follows_every_page(drive):
+    manifest = DriveManifest(drive, '')
+    tree = _tree(manifest)
+    assert sorted(tree['data_new']['Delhi']) == [f"W{k}.xlsx" for k in range(5)]
+    assert list(tree['data_new']['Pune']) == ["W1.xlsx"] and 'brand_mappings.json' in tree
+    # start token, root (1 page), data_new (1), Delhi + Pune in one query (3 pages of 2)
+    assert manifest.requests == 1 + 1 + 1 + 3
+    assert manifest.stats()['items'] == 10
+
+def test_refresh_without_changes_is_one_request(drive):
+    manifest = DriveManifest(drive, '')
+    before = _tree(manifest)
+    requests = manifest.requests
+    manifest.refresh(force=True)
+    assert manifest.requests == requests + 1 and _tree(manifest) == before
+
+def test_refresh_applies_added_modified_and_removed_items(drive, tmp_path):
+    manifest = DriveManifest(drive, '')
+    before = _tree(manifest)
+    _write(tmp_path / "data_new" / "Mumbai" / "W1.xlsx", b"mumbai")
+    _write(tmp_path / "data_new" / "Delhi" / "W5.xlsx", b"W5")
+    _write(tmp_path / "data_new" / "Delhi" / "W2.xlsx", b"W2 revised")
+    for name in os.listdir(tmp_path / "data_new" / "Pune"): os.remove(tmp_path / "data_new" / "Pune" / name)
+    os.rmdir(tmp_path / "data_new" / "Pune")
+    manifest.refresh(force=True)
+    tree = _tree(manifest)
+    assert sorted(tree['data_new']) == ['Delhi', 'Mumbai']
+    assert list(tree['data_new']['Mumbai']) == ["W1.xlsx"]
+    assert sorted(tree['data_new']['Delhi']) == [f"W{k}.xlsx" for k in range(6)]
+    assert tree['data_new']['Delhi']['W2.xlsx'] != before['data_new']['Delhi']['W2.xlsx']
+    assert tree['data_new']['Delhi']['W0.xlsx'] == before['data_new']['Delhi']['W0.xlsx']
+    assert manifest.folder(os.path.join('data_new', 'Pune')) == {}
+    assert not any(item_id.startswith(os.path.join('data_new', 'Pune')) for item_id in manifest._items)
+    assert manifest.stats()['items'] == 10 - 2 + 3
+
+def test_invalid_page_token_falls_back_to_a_full_listing(drive, tmp_path):
+    manifest = DriveManifest(drive, '')
+    before = _tree(manifest)
+    _write(tmp_path / "data_new" / "Delhi" / "W5.xlsx", b"W5")
+    manifest._page_token = 'expired'
+    requests = manifest.requests
+    manifest.refresh(force=True)
+    assert manifest.requests == requests + 1 + 7  # the failed changes().list, then the full listing (Delhi now spans 4 pages)
+    tree = _tree(manifest)
+    assert manifest._page_token.isdigit()
+    assert tree['data_new']['Delhi'] == {**before['data_new']['Delhi'], 'W5.xlsx': tree['data_new']['Delhi']['W5.xlsx']}
+    requests = manifest.requests
+    manifest.refresh(force=True)
+    assert manifest.requests == requests + 1
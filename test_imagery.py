@@ -0,0 +1,84 @@
+# test_imagery.py
+
+import re
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics_cube import WaveCube
+from synthetic_survey import make_wave
+from utils_V2_new import calculate_se_and_z_excel_style, compute_dynamic_imagery, imagery_hit_tensor
+from wave_data import normalize_wave, wave_schema
+
+def _legacy_imagery(df, base_counts, ref_col_name="q7_3"):
+    """The per-statement df[df[q7_col].notna()] loop compute_dynamic_imagery replaced, kept as the reference."""
+    df = df.set_axis([str(c).lower() for c in df.columns], axis=1)
+    q7_cols = [col for col in df.columns if col.startswith("q7_")]
+    q_ref = ref_col_name.lower()
+    q6_lookup, question_numbers = {}, set()
+    for col in df.columns:
+        match = re.match(r"^(q6a)[._/](\d+)[._/](\d+)$", col)
+        if match and int(match.group(2)) <= 18:
+            q6_lookup[(match.group(2), match.group(3))] = col; question_numbers.add(match.group(2))
+    results = []
+    for q_num in sorted(question_numbers):
+        row = {'Question': f'q6a.{q_num}'}
+        for q7_col in q7_cols:
+            q6_col = q6_lookup.get((q_num, q7_col.split('_')[1]))
+            brand_rows = df[df[q7_col].notna()]
+            row[q7_col] = round((brand_rows[q6_col] >= 1).sum() / len(brand_rows) * 100) if q6_col and not brand_rows.empty else np.nan
+        results.append(row)
+    imagery_df = pd.DataFrame(results)
+    for q7_col in [c for c in q7_cols if c != q_ref]:
+        z_scores, sig_results, diff_results = [], [], []
+        n1, n2 = base_counts.get(q_ref, 0), base_counts.get(q7_col, 0)
+        for _, row in imagery_df.iterrows():
+            p1, p2 = row.get(q_ref), row.get(q7_col)
+            if n1 < 45 or n2 < 45:
+                diff_results.append("LB"); z_scores.append(np.nan); sig_results.append("LB")
+            elif pd.notna(p1) and pd.notna(p2):
+                _, z, sig = calculate_se_and_z_excel_style(p1, p2, n1, n2)
+                diff_results.append(round(p1 - p2, 2)); z_scores.append(z); sig_results.append(sig)
+            else:
+                diff_results.append(np.nan); z_scores.append(np.nan); sig_results.append("Insufficient base")
+        imagery_df[f'{q_ref}_minus_{q7_col}'] = diff_results
+        imagery_df[f'Z_{q_ref}_vs_{q7_col}'] = z_scores
+        imagery_df[f'Sig_{q_ref}_vs_{q7_col}'] = sig_results
+    return imagery_df
+
+def _assert_same_table(actual, expected):
+    norm = lambda d: d.astype(object).where(d.notna(), np.nan).reset_index(drop=True)
+    pd.testing.assert_frame_equal(norm(actual), norm(expected), check_dtype=False, check_column_type=False)
+
+def _wave(n, brands, seed):
+    """A normalized synthetic wave with one statement/brand pair (q6a.5 for brand 2) missing its column."""
+    return normalize_wave(make_wave(n, brands=brands, seed=seed).drop(columns='Q6a.5.2'))
+
+def _filtered(wave, gender, nccs_group):
+    keep = np.ones(len(wave), dtype=bool)
+    if gender != "All": keep &= (wave['gender'] == gender).to_numpy()
+    if nccs_group != "All": keep &= (wave['nccs_group'] == nccs_group).to_numpy()
+    return wave[keep]
+
+CASES = [(brands, seed, filters) for brands, seed in [(3, 1), (4, 2)] for filters in [("All", "All"), ("Female", "NCCS A")]]
+
+@pytest.mark.parametrize("brands,seed,filters", CASES)
+def test_imagery_matches_legacy_loop(brands, seed, filters):
+    wave = _wave(300, brands, seed)
+    rows = _filtered(wave, *filters)
+    base_counts = wave_schema(rows).brand_bases(rows)
+    expected = _legacy_imagery(rows, base_counts)
+    if filters != ("All", "All"): assert min(base_counts.values()) < 45
+    _assert_same_table(compute_dynamic_imagery.__wrapped__(rows, base_counts), expected)
+    cube = WaveCube(wave)
+    _assert_same_table(cube.imagery_comparisons(cube.cell_mask(filters[0], "All", filters[1])).table('q7_3'), expected)
+
+def test_missing_pair_is_not_asked():
+    wave = _wave(200, 4, 3)
+    schema = wave_schema(wave)
+    hits, asked = imagery_hit_tensor(wave, schema)
+    assert hits.shape == (len(wave), len(schema.statements), 4)
+    assert not asked[schema.statements.index('5'), schema.q7_cols.index('q7_2')] and asked.sum() == asked.size - 1
+    table = compute_dynamic_imagery.__wrapped__(wave, schema.brand_bases(wave))
+    row = table[table['Question'] == 'q6a.5'].iloc[0]
+    assert np.isnan(row['q7_2']) and np.isnan(row['q7_3_minus_q7_2']) and row['Sig_q7_3_vs_q7_2'] == "Insufficient base"
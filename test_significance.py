@@ -0,0 +1,85 @@
+# test_significance.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils_V2_new import calculate_se_and_z_excel_style, calculate_se_and_z_vectorized, compare_to_reference
+
+def _legacy_comparison(scores_df, base_counts_df, ref_col, index_col_name):
+    """The row-by-row _add_comparison_and_sig_tests the vectorized path replaced, kept as the reference."""
+    scores_df = scores_df.set_index(index_col_name)
+    base_counts_df = base_counts_df.set_index(index_col_name)
+    for comp_col in [c for c in scores_df.columns if c != ref_col]:
+        diff_results, z_scores, sig_results = [], [], []
+        for idx, row in scores_df.iterrows():
+            p1, p2 = row.get(ref_col), row.get(comp_col)
+            n1, n2 = base_counts_df.loc[idx].get(ref_col, 0), base_counts_df.loc[idx].get(comp_col, 0)
+            if n1 < 45 or n2 < 45 or pd.isna(n1) or pd.isna(n2):
+                diff_results.append("LB"); z_scores.append(np.nan); sig_results.append("LB")
+            elif pd.notna(p1) and pd.notna(p2) and n1 > 0 and n2 > 0:
+                _, z, sig = calculate_se_and_z_excel_style(p1, p2, n1, n2)
+                diff_results.append(round(p1 - p2, 2)); z_scores.append(z); sig_results.append(sig)
+            else:
+                diff_results.append("Insufficient base"); z_scores.append(np.nan); sig_results.append("Insufficient base")
+        scores_df[f'{ref_col}_minus_{comp_col}'] = diff_results
+        scores_df[f'Z_{ref_col}_vs_{comp_col}'] = z_scores
+        scores_df[f'Sig_{ref_col}_vs_{comp_col}'] = sig_results
+    return scores_df.reset_index()
+
+def _same_z(vectorized, scalar):
+    """z agrees when the scalar None (se == 0) is NaN in the array version, and is equal otherwise."""
+    return np.isnan(vectorized) if scalar is None else vectorized == scalar
+
+def test_vectorized_matches_scalar_on_integer_inputs():
+    rng = np.random.default_rng(0)
+    p1, p2 = rng.integers(-100, 101, 20000), rng.integers(-100, 101, 20000)
+    n1, n2 = rng.integers(0, 300, 20000), rng.integers(0, 300, 20000)
+    se, z, sig = calculate_se_and_z_vectorized(p1, p2, n1, n2)
+    for k in range(len(p1)):
+        expected = calculate_se_and_z_excel_style(int(p1[k]), int(p2[k]), int(n1[k]), int(n2[k]))
+        assert se[k] == expected[0]
+        assert _same_z(z[k], expected[1]), (p1[k], p2[k], n1[k], n2[k])
+        assert sig[k] == expected[2]
+
+def test_zero_standard_error_gives_nan_z_and_not_significant():
+    for p in (0, 100):
+        se, z, sig = calculate_se_and_z_vectorized([p], [p], [100], [100])
+        assert calculate_se_and_z_excel_style(p, p, 100, 100) == (0, None, "Not Significant")
+        assert se[0] == 0 and np.isnan(z[0]) and sig[0] == "Not Significant"
+
+def test_compare_to_reference_rules():
+    diff, z, sig = compare_to_reference([[40, 40, 40, np.nan]], [[30, 30, np.nan, 30]], [[100, 44, 100, 100]], [[100, 100, 100, 100]])
+    assert diff[0, 0] == 10 and sig[0, 0] in ("Significant", "Not Significant") and not np.isnan(z[0, 0])
+    assert diff[0, 1] == "LB" and sig[0, 1] == "LB" and np.isnan(z[0, 1])
+    assert diff[0, 2] == "Insufficient base" and sig[0, 2] == "Insufficient base" and np.isnan(z[0, 2])
+    assert diff[0, 3] == "Insufficient base" and sig[0, 3] == "Insufficient base"
+
+def test_imagery_insufficient_diff_is_nan():
+    diff, z, sig = compare_to_reference([[40]], [[np.nan]], [[100]], [[100]], insufficient_diff=np.nan)
+    assert np.isnan(diff[0, 0]) and np.isnan(z[0, 0]) and sig[0, 0] == "Insufficient base"
+    diff, _, sig = compare_to_reference([[40]], [[np.nan]], [[100]], [[30]], insufficient_diff=np.nan)
+    assert diff[0, 0] == "LB" and sig[0, 0] == "LB"
+
+def test_diff_and_z_round_to_two_places():
+    diff, z, _ = compare_to_reference([[12.3456]], [[2.1]], [[150]], [[90]])
+    _, expected_z, _ = calculate_se_and_z_excel_style(12.3456, 2.1, 150, 90)
+    assert diff[0, 0] == round(12.3456 - 2.1, 2) == 10.25
+    assert z[0, 0] == expected_z
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_legacy_row_by_row_comparison(seed):
+    rng = np.random.default_rng(seed)
+    cols = ['q7_1', 'q7_2', 'q7_3', 'q7_4']
+    scores = rng.integers(-100, 101, (30, 4)).astype(float)
+    scores[rng.random(scores.shape) < 0.1] = np.nan
+    bases = rng.integers(0, 120, (30, 4)).astype(float)
+    labels = [f'Row {k}' for k in range(30)]
+    scores_df = pd.DataFrame(scores, columns=cols).assign(Segment=labels)
+    legacy = _legacy_comparison(scores_df, pd.DataFrame(bases, columns=cols).assign(Segment=labels), 'q7_3', 'Segment')
+    comp = [c for c in cols if c != 'q7_3']
+    diff, z, sig = compare_to_reference(scores[:, [2]], scores[:, [cols.index(c) for c in comp]], bases[:, [2]], bases[:, [cols.index(c) for c in comp]])
+    for j, col in enumerate(comp):
+        assert diff[:, j].tolist() == legacy[f'q7_3_minus_{col}'].tolist()
+        assert sig[:, j].tolist() == legacy[f'Sig_q7_3_vs_{col}'].tolist()
+        np.testing.assert_array_equal(z[:, j], legacy[f'Z_q7_3_vs_{col}'].to_numpy(dtype=float))
@@ -0,0 +1,45 @@
+# test_wave_excel.py
+
+import io
+import numpy as np
+import pandas as pd
+
+import wave_excel
+from pandas._libs.parsers import STR_NA_VALUES
+from synthetic_survey import make_wave
+from wave_data import is_wave_column
+
+def _workbook(tmp_path):
+    df = make_wave(120, brands=3, seed=5, filler=4)
+    df.loc[[7, 40], :] = np.nan
+    path = tmp_path / "W1.xlsx"
+    df.to_excel(path, index=False)
+    return path, pd.read_excel(path, usecols=is_wave_column).dropna(how='all')
+
+def test_pruned_read_matches_read_excel(tmp_path):
+    path, expected = _workbook(tmp_path)
+    df = wave_excel.read_wave_excel(path)
+    assert not any(c.startswith('X') for c in df.columns) and len(df) == 118
+    pd.testing.assert_frame_equal(df.astype(float), expected.astype(float))
+
+def test_na_text_cells_are_missing_as_in_read_excel(tmp_path):
+    df = make_wave(120, brands=3, seed=6).astype(object)
+    df.loc[[3, 9, 50], 'Q7_2'] = ['#N/A', 'NA', 'N/A']
+    df.loc[[4, 60], 'Q6a.1.1'] = ['null', '']
+    df.loc[70, :] = 'NA'
+    path = tmp_path / "W1.xlsx"
+    df.to_excel(path, index=False)
+    expected = pd.read_excel(path, usecols=is_wave_column).dropna(how='all')
+    actual = wave_excel.read_wave_excel(path)
+    assert len(actual) == 119 and actual['Q7_2'].isna().sum() == expected['Q7_2'].isna().sum()
+    pd.testing.assert_frame_equal(actual.astype(float), expected.astype(float))
+    assert wave_excel.NA_STRINGS == STR_NA_VALUES
+
+def test_falls_back_to_read_excel_when_the_parser_breaks(tmp_path, monkeypatch, caplog):
+    path, expected = _workbook(tmp_path)
+    def broken(self, row): raise AttributeError("internal API changed")
+    monkeypatch.setattr(wave_excel._PrunedSheetParser, 'parse_row', broken)
+    source = io.BytesIO(path.read_bytes())
+    df = wave_excel.read_wave_excel(source)
+    assert "falling back" in caplog.text
+    pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,50 @@
+# test_wave_loader.py
+
+import time
+import functools
+import pandas as pd
+
+from local_drive import LocalDriveService
+from wave_cache import WaveCache
+from wave_loader import fetch_wave, load_waves
+
+def _drive(tmp_path, waves):
+    for name, df in waves.items(): df.to_excel(tmp_path / f"{name}.xlsx", index=False)
+    return LocalDriveService(tmp_path)
+
+def _wave(n, seed):
+    return pd.DataFrame({'Q1a': [1 + (k + seed) % 2 for k in range(n)], 'Q7_1': [(k * 3 + seed) % 11 for k in range(n)], 'Other': ['x'] * n})
+
+def test_load_waves_reads_every_file_in_order(tmp_path):
+    drive = _drive(tmp_path, {f"W{k}": _wave(20 + k, k) for k in range(4)})
+    fetch = functools.partial(fetch_wave, wave_cache=WaveCache(tmp_path / "cache"))
+    wave_files = {f"W{k}": (f"W{k}.xlsx", drive._metadata(f"W{k}.xlsx")['md5Checksum']) for k in (3, 0, 2, 1)}
+    loaded, errors = load_waves(drive, wave_files, max_workers=4, fetch=fetch)
+    assert errors == {}
+    assert list(loaded) == ['W3', 'W0', 'W2', 'W1']
+    for k in range(4):
+        assert len(loaded[f"W{k}"]) == 20 + k
+        assert list(loaded[f"W{k}"].columns) == ['Q1a', 'Q7_1']
+        assert loaded[f"W{k}"]['Q7_1'].astype(int).tolist() == _wave(20 + k, k)['Q7_1'].tolist()
+
+def test_load_waves_keeps_order_whatever_finishes_first(tmp_path):
+    def fetch(drive_service, file_id, version):
+        time.sleep(0.05 * (3 - int(file_id)))
+        return file_id
+    loaded, errors = load_waves(None, {f"W{k}": (str(k), None) for k in range(4)}, max_workers=4, fetch=fetch)
+    assert errors == {} and list(loaded.items()) == [(f"W{k}", str(k)) for k in range(4)]
+
+def test_load_waves_collects_errors_without_dropping_other_waves(tmp_path):
+    drive = _drive(tmp_path, {"W1": _wave(10, 1), "W2": _wave(12, 2)})
+    fetch = functools.partial(fetch_wave, wave_cache=WaveCache(tmp_path / "cache"))
+    loaded, errors = load_waves(drive, {"W1": ("W1.xlsx", "v1"), "missing": ("nope.xlsx", "v1"), "W2": ("W2.xlsx", "v1")}, fetch=fetch)
+    assert list(loaded) == ["W1", "W2"]
+    assert list(errors) == ["missing"] and isinstance(errors["missing"], FileNotFoundError)
+
+def test_fetch_wave_serves_a_seen_version_from_the_cache(tmp_path):
+    drive = _drive(tmp_path, {"W1": _wave(10, 1)})
+    cache = WaveCache(tmp_path / "cache")
+    first = fetch_wave(drive, "W1.xlsx", "v1", wave_cache=cache)
+    (tmp_path / "W1.xlsx").unlink()
+    pd.testing.assert_frame_equal(fetch_wave(drive, "W1.xlsx", "v1", wave_cache=cache), first)
+    assert load_waves(drive, {}) == ({}, {})
@@ -0,0 +1,28 @@
+# test_wave_registry.py
+
+from synthetic_survey import make_wave
+from wave_data import normalize_wave
+from wave_registry import WaveKey, WaveRegistry
+
+FILTERS = ("All", "All", "All")
+
+def _waves(count):
+    return {WaveKey(f"W{k}.xlsx", "v1"): normalize_wave(make_wave(200, brands=3, seed=k)) for k in range(count)}
+
+def test_evicted_wave_is_added_back_from_the_callers_frame():
+    registry, waves = WaveRegistry(max_waves=2), _waves(3)
+    (k0, df0), (k1, df1), (k2, df2) = waves.items()
+    registry.add(k0, df0)
+    held = registry.get(k0)  # this rerun's reference
+    registry.add(k1, df1); registry.add(k2, df2)  # another session's waves evict k0
+    assert registry.get(k0) is None and k0 not in registry
+    expected = WaveRegistry().analysis(k0, FILTERS, 'nps_comparisons', df0).table('q7_3')
+    assert registry.analysis(k0, FILTERS, 'nps_comparisons', held).table('q7_3').equals(expected)
+    assert k0 in registry and registry.stats()['waves'] == 2
+
+def test_trend_over_more_waves_than_the_registry_keeps():
+    registry, waves = WaveRegistry(max_waves=2), _waves(3)
+    for key, df in waves.items(): registry.add(key, df)
+    trend = registry.trend(list(waves), FILTERS, ['W0', 'W1', 'W2'], list(waves.values()))
+    assert trend.nps_table()['Wave'].tolist() == ['W0', 'W1', 'W2']
+    assert registry.stats()['waves'] == 2
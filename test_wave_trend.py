@@ -0,0 +1,34 @@
+# test_wave_trend.py
+
+import numpy as np
+import pandas as pd
+
+from analytics_cube import WaveCube
+from synthetic_survey import make_wave
+from wave_data import normalize_wave
+from wave_trend import PREVIOUS_WAVE, WaveTrend
+
+def _trend(*brand_counts):
+    cubes = [WaveCube(normalize_wave(make_wave(600, brands=brands, seed=w, city_seed=0))) for w, brands in enumerate(brand_counts)]
+    return WaveTrend([f"W{w + 1}" for w in range(len(cubes))], cubes, [cube.cell_mask() for cube in cubes])
+
+def test_brand_added_in_a_later_wave_is_lb_not_zero():
+    trend = _trend(3, 4)
+    tom = trend.tom_table()
+    assert np.isnan(tom.loc[0, '4']) and tom.loc[1, '4'] > 0
+    assert tom.loc[1, f'4_minus_{PREVIOUS_WAVE}'] == "LB" and tom.loc[1, f'Sig_4_vs_{PREVIOUS_WAVE}'] == "LB"
+    assert isinstance(tom.loc[1, f'1_minus_{PREVIOUS_WAVE}'], float)
+    nps, imagery = trend.nps_table(), trend.imagery_table('1')
+    for table in (nps, imagery):
+        assert np.isnan(table.loc[0, 'q7_4']) and table.loc[1, f'Sig_q7_4_vs_{PREVIOUS_WAVE}'] == "LB"
+        assert table.loc[1, f'Sig_q7_1_vs_{PREVIOUS_WAVE}'] in ("Significant", "Not Significant")
+
+def test_brand_dropped_in_a_later_wave_is_lb():
+    tom = _trend(4, 3).tom_table()
+    assert tom.loc[0, '4'] > 0 and np.isnan(tom.loc[1, '4'])
+    assert tom.loc[1, f'Sig_4_vs_{PREVIOUS_WAVE}'] == "LB"
+
+def test_first_wave_has_no_change():
+    tom = _trend(4, 4).tom_table()
+    assert pd.isna(tom.loc[0, f'1_minus_{PREVIOUS_WAVE}']) and np.isnan(tom.loc[0, f'Z_1_vs_{PREVIOUS_WAVE}'])
+    assert tom[[str(v) for v in range(1, 5)]].sum(axis=1).between(98, 102).all()
@@ -3,8 +3,12 @@
 import pandas as pd
 import numpy as np
 import math
-import re
-import streamlit as st
+import logging
+
+from wave_data import lowercase_columns, wave_schema
+from analysis_cache import cached
+
+logger = logging.getLogger(__name__)
 Z_SCORE_95_CONFIDENCE = 1.96
 
 def calculate_se_and_z_excel_style(p1, p2, n1, n2):
@@ -17,197 +21,270 @@ def calculate_se_and_z_excel_style(p1, p2, n1, n2):
     rounded_z = round(z, 2) if z is not None else None
     return round(se, 2), rounded_z, significance
 
-def _add_comparison_and_sig_tests(scores_df, base_counts_df, ref_col, score_col_name, index_col_name):
-    scores_df = scores_df.set_index(index_col_name)
-    base_counts_df = base_counts_df.set_index(index_col_name)
-    comparison_cols = [c for c in scores_df.columns if c != ref_col]
-    for comp_col in comparison_cols:
-        diff_results, z_scores, sig_results = [], [], []
-        for idx, row in scores_df.iterrows():
-            p1, p2 = row.get(ref_col), row.get(comp_col)
-            n1, n2 = base_counts_df.loc[idx].get(ref_col, 0), base_counts_df.loc[idx].get(comp_col, 0)
-            if n1 < 45 or n2 < 45 or pd.isna(n1) or pd.isna(n2):
-                diff_results.append("LB"); z_scores.append(np.nan); sig_results.append("LB")
-            elif pd.notna(p1) and pd.notna(p2) and n1 > 0 and n2 > 0:
-                diff = p1 - p2
-                _, z, sig = calculate_se_and_z_excel_style(p1, p2, n1, n2)
-                diff_results.append(round(diff,2)); z_scores.append(z); sig_results.append(sig)
-            else:
-                diff_results.append("Insufficient base"); z_scores.append(np.nan); sig_results.append("Insufficient base")
-        scores_df[f'{ref_col}_minus_{comp_col}'] = diff_results
-        scores_df[f'Z_{ref_col}_vs_{comp_col}'] = z_scores
-        scores_df[f'Sig_{ref_col}_vs_{comp_col}'] = sig_results
-    return scores_df.reset_index()
-
-@st.cache_data
+def calculate_se_and_z_vectorized(p1, p2, n1, n2):
+    """Array version of calculate_se_and_z_excel_style; z is NaN where the scalar version returns None."""
+    p1, p2, n1, n2 = (np.asarray(a, dtype=float) for a in (p1, p2, n1, n2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        term1 = np.where(n1 > 0, p1 * (100 - p1) / n1, 0.0)
+        term2 = np.where(n2 > 0, p2 * (100 - p2) / n2, 0.0)
+        se_squared = term1 + term2
+        se = np.where(se_squared > 0, np.sqrt(se_squared), 0.0)
+        z = np.where(se != 0, (p1 - p2) / se, np.nan)
+    significance = np.where(np.abs(z) > Z_SCORE_95_CONFIDENCE, "Significant", "Not Significant").astype(object)
+    return np.round(se, 2), np.round(z, 2), significance
+
+def compare_to_reference(p_ref, p_comp, n_ref, n_comp, insufficient_diff="Insufficient base"):
+    """Diff/Z/Sig of the reference against every comparison cell in one call.
+    Inputs broadcast against each other (e.g. p_ref (rows, 1) vs p_comp (rows, brands)). Bases under 45 give "LB",
+    missing scores or empty bases give `insufficient_diff` / "Insufficient base", as in the row-by-row version."""
+    p_ref, p_comp, n_ref, n_comp = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (p_ref, p_comp, n_ref, n_comp)))
+    low_base = (n_ref < 45) | (n_comp < 45) | np.isnan(n_ref) | np.isnan(n_comp)
+    testable = ~low_base & ~np.isnan(p_ref) & ~np.isnan(p_comp) & (n_ref > 0) & (n_comp > 0)
+    _, z, sig = calculate_se_and_z_vectorized(p_ref, p_comp, n_ref, n_comp)
+    diff = np.full(p_ref.shape, insufficient_diff, dtype=object)
+    diff[testable] = np.round(p_ref - p_comp, 2)[testable]
+    diff[low_base] = "LB"
+    z = np.where(testable, z, np.nan)
+    sig = np.where(testable, sig, "Insufficient base").astype(object)
+    sig[low_base] = "LB"
+    return diff, z, sig
+
+def _comparison_columns(ref_col, comparison_cols, diff, z, sig):
+    columns = {}
+    for j, comp_col in enumerate(comparison_cols):
+        columns[f'{ref_col}_minus_{comp_col}'] = diff[:, j].tolist()
+        columns[f'Z_{ref_col}_vs_{comp_col}'] = z[:, j]
+        columns[f'Sig_{ref_col}_vs_{comp_col}'] = sig[:, j].tolist()
+    return columns
+
+def wave_over_wave(scores, bases, insufficient_diff="Insufficient base"):
+    """Diff/Z/Sig of every wave against the wave before it, for scores and bases stacked along a leading wave axis
+    (any trailing shape), in one compare_to_reference call. The first wave has nothing to compare with: None/NaN."""
+    scores, bases = np.broadcast_arrays(np.asarray(scores, dtype=float), np.asarray(bases, dtype=float))
+    diff, z, sig = np.full(scores.shape, None, dtype=object), np.full(scores.shape, np.nan), np.full(scores.shape, None, dtype=object)
+    if len(scores) > 1: diff[1:], z[1:], sig[1:] = compare_to_reference(scores[1:], scores[:-1], bases[1:], bases[:-1], insufficient_diff)
+    return diff, z, sig
+
+class ComparisonMatrix:
+    """Scores and bases of one analysis table with diff/Z/Sig precomputed for every ordered pair of compared columns,
+    so the table against any reference column is a slice instead of a recompute.
+    leading holds the label columns (one row per table row), score_values the displayed score columns in output order,
+    and scores/bases the (rows, compare_cols) matrices the tests run on; bases may be a single row shared by all rows."""
+
+    def __init__(self, leading, score_values, compare_cols, scores, bases, insufficient_diff="Insufficient base"):
+        self.leading, self.score_values, self.compare_cols = leading, score_values, list(compare_cols)
+        self.scores, self.bases = np.asarray(scores, dtype=float), np.asarray(bases, dtype=float)
+        self.insufficient_diff = insufficient_diff
+        self.diff, self.z, self.sig = compare_to_reference(self.scores[:, :, None], self.scores[:, None, :], self.bases[:, :, None], self.bases[:, None, :], insufficient_diff)
+
+    @classmethod
+    def empty(cls):
+        return cls(None, {}, [], np.zeros((0, 0)), np.zeros((0, 0)))
+
+    def table(self, ref_col):
+        if self.leading is None: return pd.DataFrame()
+        columns = {**{col: self.leading[col] for col in self.leading.columns}, **self.score_values}
+        comparison_cols = [c for c in self.compare_cols if c != ref_col]
+        if comparison_cols: columns.update(self._comparisons(ref_col, comparison_cols))
+        return pd.DataFrame(columns, index=self.leading.index).rename_axis(columns=self.leading.columns.name)
+
+    def _comparisons(self, ref_col, comparison_cols):
+        comp_idx = [self.compare_cols.index(c) for c in comparison_cols]
+        if ref_col in self.compare_cols:
+            ref_idx = self.compare_cols.index(ref_col)
+            diff, z, sig = self.diff[:, ref_idx, comp_idx], self.z[:, ref_idx, comp_idx], self.sig[:, ref_idx, comp_idx]
+        else:
+            diff, z, sig = compare_to_reference(np.nan, self.scores[:, comp_idx], 0, self.bases[:, comp_idx], self.insufficient_diff)
+        return _comparison_columns(ref_col, comparison_cols, diff, z, sig)
+
+class TomComparison:
+    """First-mention shares with Z/Sig for every brand pair (all tested on the total base); table(ref_brand) builds the TOM
+    table for one reference."""
+
+    def __init__(self, brand_values, counts):
+        self.total = int(np.sum(counts))
+        self.brands = [str(k) for k in brand_values]
+        self.scores = np.array([round((v / self.total) * 100) for v in counts] if self.total else [], dtype=np.int64)
+        _, self.z, self.sig = compare_to_reference(self.scores[:, None], self.scores[None, :], self.total, self.total)
+
+    def table(self, ref_brand):
+        if self.total == 0: return pd.DataFrame()
+        ref = str(ref_brand)
+        if ref not in self.brands:
+            logger.warning(f"Reference brand '{ref}' not found for TOM analysis.")
+            return pd.DataFrame()
+        ref_idx = self.brands.index(ref)
+        others = [j for j in range(len(self.brands)) if j != ref_idx]
+        return pd.DataFrame({
+            'Brand': self.brands + [f'{ref} - {self.brands[j]}' for j in others],
+            'TOM (%)': self.scores.tolist() + [int(self.scores[ref_idx] - self.scores[j]) for j in others],
+            'Z Score': [np.nan] * len(self.brands) + [self.z[ref_idx, j] for j in others],
+            'Significance': [None] * len(self.brands) + [self.sig[ref_idx, j] for j in others]})
+
+NPS_SCALE_POINTS = 11
+
+def column_matrix(df, cols):
+    """(rows, len(cols)) float array of the given columns, filled column by column so no intermediate frame is built.
+    Non-numeric entries become NaN."""
+    values = np.empty((len(df), len(cols)))
+    for j, col in enumerate(cols):
+        series = df[col]
+        if not pd.api.types.is_numeric_dtype(series.dtype): series = pd.to_numeric(series, errors='coerce')
+        values[:, j] = series.to_numpy(dtype=float, na_value=np.nan)
+    return values
+
+def answered_matrix(df, cols):
+    """(rows, len(cols)) boolean array of non-missing answers."""
+    answered = np.empty((len(df), len(cols)), dtype=bool)
+    for j, col in enumerate(cols): answered[:, j] = df[col].notna().to_numpy()
+    return answered
+
+def rating_histograms(df, cols, group_codes=None, n_groups=1):
+    """Counts of each 0-10 rating for every column in one bincount pass, shape (len(cols), 12).
+    Non-missing numeric answers off the 0-10 scale land in the last bin so they still count towards the base.
+    With group_codes (one code per row, or a (rows, k) array for k groupings sharing one code space; -1 skips the row)
+    the result is (n_groups, len(cols), 12)."""
+    cols = list(cols)
+    width = NPS_SCALE_POINTS + 1
+    grouped = group_codes is not None
+    group_codes = np.asarray(group_codes, dtype=np.int64).reshape(len(df), -1) if grouped else np.zeros((len(df), 1), dtype=np.int64)
+    if not cols:
+        hist = np.zeros((n_groups, 0, width), dtype=np.int64)
+        return hist if grouped else hist[0]
+    values = column_matrix(df, cols)
+    answered = ~np.isnan(values)
+    on_scale = answered & (values >= 0) & (values <= 10) & (values == np.floor(values))
+    bins = np.where(on_scale, values, NPS_SCALE_POINTS).astype(np.int64)
+    cells = (group_codes[:, :, None] * len(cols) + np.arange(len(cols))) * width + bins[:, None, :]
+    keep = answered[:, None, :] & (group_codes[:, :, None] >= 0)
+    hist = np.bincount(cells[keep], minlength=n_groups * len(cols) * width).reshape(n_groups, len(cols), width)
+    return hist if grouped else hist[0]
+
+def nps_from_histograms(hist):
+    """Rounded NPS (NaN where nobody answered) and base for every histogram along the last axis."""
+    hist = np.asarray(hist)
+    base = hist.sum(axis=-1)
+    promoters = hist[..., 9] + hist[..., 10]
+    detractors = hist[..., :7].sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nps = np.where(base > 0, np.round((promoters - detractors) / base * 100), np.nan)
+    return nps, base
+
+def _nps_row(cols, nps, base):
+    return {col: (int(v) if n else None) for col, v, n in zip(cols, nps, base)}
+
+def imagery_hit_tensor(df, schema):
+    """q6a agreement as a (rows, statements, brands) boolean tensor, read in one pass over the imagery columns, plus the
+    (statements, brands) mask of pairs that have a column. Brands follow schema.q7_cols."""
+    pairs = [(i, j, schema.imagery_column(q_num, q7_col)) for i, q_num in enumerate(schema.statements) for j, q7_col in enumerate(schema.q7_cols)]
+    pairs = [(i, j, col) for i, j, col in pairs if col]
+    hits = np.zeros((len(df), len(schema.statements), len(schema.q7_cols)), dtype=bool)
+    asked = np.zeros(hits.shape[1:], dtype=bool)
+    if pairs:
+        rows, cols, q6_cols = zip(*pairs)
+        with np.errstate(invalid='ignore'): hits[:, rows, cols] = column_matrix(df, q6_cols) >= 1
+        asked[rows, cols] = True
+    return hits, asked
+
+def grouped_counts(mask, group_codes, n_groups):
+    """Per-group column sums of a (rows, k) boolean mask in one bincount, shape (n_groups, k); code -1 skips a row."""
+    mask = np.asarray(mask, dtype=bool).reshape(len(group_codes), -1)
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    cells = group_codes[:, None] * mask.shape[1] + np.arange(mask.shape[1])
+    keep = mask & (group_codes[:, None] >= 0)
+    return np.bincount(cells[keep], minlength=n_groups * mask.shape[1]).reshape(n_groups, mask.shape[1])
+
+def nps_comparisons(q7_cols, hist):
+    """Overall NPS row, from (brands, 12) rating histograms."""
+    nps, base = nps_from_histograms(hist)
+    return ComparisonMatrix(pd.DataFrame({'Paper': ['Overall']}), {col: [value] for col, value in _nps_row(q7_cols, nps, base).items()}, q7_cols, nps[None, :], base[None, :])
+
+def tom_comparisons(brand_values, counts):
+    """TOM shares from first-mention counts, ordered as value_counts would order them."""
+    return TomComparison(brand_values, counts)
+
+def segmented_nps_comparisons(segments, segmentations, q7_cols, hist, labelled=False):
+    """Segment rows, from (segments, brands, 12) rating histograms."""
+    nps, base = nps_from_histograms(hist)
+    leading = pd.DataFrame({'Segmentation': list(segmentations), 'Segment': list(segments)} if labelled else {'Segment': list(segments)})
+    rows = [_nps_row(q7_cols, row_nps, row_base) for row_nps, row_base in zip(nps, base)]
+    return ComparisonMatrix(leading, {col: [row[col] for row in rows] for col in q7_cols}, q7_cols, nps, base)
+
+def imagery_comparisons(question_numbers, q7_cols, hits, respondents, base_counts, scored_cols=None):
+    """Imagery scores. hits is (statements, brands), NaN where a statement has no column for the brand; respondents is
+    each brand's q7 base, which every statement percentage is taken over. Only scored_cols (the q7 columns carrying a
+    brand number, by default all) get score columns; base_counts are the bases the significance tests use."""
+    scored_cols = set(q7_cols if scored_cols is None else scored_cols)
+    respondents = np.asarray(respondents, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(respondents > 0, np.round(np.asarray(hits, dtype=float) / respondents * 100), np.nan)
+    scores = np.where([col in scored_cols for col in q7_cols], scores, np.nan)
+    bases = np.array([[base_counts.get(c, 0) for c in q7_cols]], dtype=float)
+    leading = pd.DataFrame({'Question': [f'q6a.{q_num}' for q_num in question_numbers]})
+    return ComparisonMatrix(leading, {col: scores[:, j] for j, col in enumerate(q7_cols) if col in scored_cols}, q7_cols, scores, bases, insufficient_diff=np.nan)
+
+def sectional_nps_comparisons(section_nums, brand_nums, hist):
+    """Section x brand NPS, from one (columns, 12) histogram per q12b column."""
+    nps, base = nps_from_histograms(hist)
+    answered = base > 0
+    if not answered.any(): return ComparisonMatrix.empty()
+    temp_df = pd.DataFrame({'section': section_nums, 'brand_col_name': [f'q12b_{b}' for b in brand_nums], 'nps': nps, 'base': base})[answered]
+    nps_df = temp_df.pivot_table(index='section', columns='brand_col_name', values='nps')
+    base_df = temp_df.pivot_table(index='section', columns='brand_col_name', values='base').reindex(index=nps_df.index, columns=nps_df.columns)
+    brand_cols = list(nps_df.columns)
+    leading = pd.DataFrame({'Q No.': nps_df.index.to_numpy()}).rename_axis(columns=nps_df.columns.name)
+    return ComparisonMatrix(leading, {col: nps_df[col].to_numpy() for col in brand_cols}, brand_cols,
+                            nps_df.to_numpy(dtype=float, na_value=np.nan), base_df.fillna(0).to_numpy(dtype=float))
+
+@cached
 def dynamic_nps_analysis(df, ref_col_name="q7_3"):
-    df.columns = [str(c).lower() for c in df.columns]
-    q7_cols = [col for col in df.columns if col.startswith("q7_")]
+    df = lowercase_columns(df)
+    q7_cols = wave_schema(df).q7_cols
     q_ref = next((col for col in q7_cols if col == ref_col_name.lower()), None)
     if q_ref is None: raise ValueError(f"Reference column '{ref_col_name}' not found.")
-    nps_results = {}
-    for col in q7_cols:
-        series = pd.to_numeric(df[col], errors='coerce').dropna()
-        if not series.empty:
-            freq = series.value_counts().reindex(range(11), fill_value=0)
-            promoters = freq[9] + freq[10]
-            detractors = freq.loc[0:6].sum()
-            nps_results[col] = round((promoters - detractors) / len(series) * 100)
-        else: nps_results[col] = None
-    scores_df = pd.DataFrame([nps_results])
-    scores_df['Paper'] = 'Overall'
-    base_counts = df[q7_cols].notna().sum().to_frame().T
-    base_counts['Paper'] = 'Overall'
-    return _add_comparison_and_sig_tests(scores_df, base_counts, q_ref, 'nps', 'Paper')
-
-@st.cache_data
+    return nps_comparisons(q7_cols, rating_histograms(df, q7_cols)).table(q_ref)
+
+@cached
 def compute_tom_from_q5a(df, ref_brand):
-    # This function remains the same, assuming it works correctly
-    target_col = None
-    for col in df.columns:
-        if str(col).lower() in ['q5a_1', 'q5a_brand1']: target_col = col; break
+    df = lowercase_columns(df)
+    target_col = wave_schema(df).tom_col
     if target_col is None: raise ValueError("Could not find a TOM column like 'q5a_1' or 'q5a_brand1'.")
-    q5_series = df[target_col].dropna().astype(int)
-    counts = q5_series.value_counts()
-    total = len(q5_series)
-    if total == 0: return pd.DataFrame()
-    tom_scores = {str(k): round((v / total) * 100) for k, v in counts.items()}
-    tom_df = pd.DataFrame(list(tom_scores.items()), columns=['Brand', 'TOM (%)'])
-    scores = tom_df.set_index('Brand')['TOM (%)']
-    ref = str(ref_brand)
-    if ref not in scores.index:
-        st.warning(f"Reference brand '{ref}' not found for TOM analysis.")
-        return pd.DataFrame()
-    diff_rows = [{'Brand': f'{ref} - {brand}', 'TOM (%)': scores[ref] - scores[brand]} for brand in scores.index if brand != ref]
-    if diff_rows: tom_df = pd.concat([tom_df, pd.DataFrame(diff_rows)], ignore_index=True)
-    base = total
-    score_lookup = tom_df.set_index("Brand")["TOM (%)"].to_dict()
-    z_scores, significance = [], []
-    for idx, row in tom_df.iterrows():
-        brand_name = row["Brand"]
-        if " - " in brand_name:
-            b1, b2 = brand_name.split(" - ")
-            p1, p2 = score_lookup.get(b1.strip()), score_lookup.get(b2.strip())
-            if base < 45 or pd.isna(base):
-                z_scores.append(np.nan); significance.append("LB")
-            elif p1 is not None and p2 is not None:
-                _, z, sig = calculate_se_and_z_excel_style(p1, p2, base, base)
-                z_scores.append(z); significance.append(sig)
-            else:
-                z_scores.append(np.nan); significance.append("Insufficient base")
-        else:
-            z_scores.append(np.nan); significance.append(None)
-    tom_df["Z Score"] = z_scores; tom_df["Significance"] = significance
-    return tom_df
-
-@st.cache_data
-def calculate_segmented_nps_with_sig(df, segment_col):
-    df.columns = [str(c).lower() for c in df.columns]
-    segment_col = segment_col.lower()
-    q7_cols = [col for col in df.columns if col.startswith('q7_')]
-    q_ref = next((col for col in q7_cols if col == 'q7_3'), None)
-    if q_ref is None: raise ValueError("Reference column 'q7_3' must be present.")
-    results = []
-    for segment in df[segment_col].dropna().unique():
-        row = {'Segment': segment}
-        segment_df = df[df[segment_col] == segment]
-        for col in q7_cols:
-            ratings = segment_df[col].dropna()
-            total = ratings.count()
-            if total == 0: row[col] = None
-            else:
-                freq_counts = ratings.value_counts().reindex(range(11), fill_value=0)
-                promoters = freq_counts[9] + freq_counts[10]
-                detractors = freq_counts.loc[0:6].sum()
-                row[col] = round((promoters - detractors) / total * 100)
-        for col in q7_cols:
-            if col == q_ref: continue
-            p1, p2 = row.get(q_ref), row.get(col)
-            n1, n2 = segment_df[q_ref].notna().sum(), segment_df[col].notna().sum()
-            if n1 < 45 or n2 < 45 or pd.isna(n1) or pd.isna(n2):
-                row[f'{q_ref}_minus_{col}'] = "LB"; row[f'Z_{q_ref}_vs_{col}'] = np.nan; row[f'Sig_{q_ref}_vs_{col}'] = "LB"
-            elif n1 == 0 or n2 == 0 or p1 is None or p2 is None:
-                row[f'{q_ref}_minus_{col}'] = "Insufficient base"; row[f'Z_{q_ref}_vs_{col}'] = np.nan; row[f'Sig_{q_ref}_vs_{col}'] = "Insufficient base"
-            else:
-                diff = p1 - p2
-                _, z, sig = calculate_se_and_z_excel_style(p1, p2, n1, n2)
-                row[f'{q_ref}_minus_{col}'] = round(diff,2); row[f'Z_{q_ref}_vs_{col}'] = z; row[f'Sig_{q_ref}_vs_{col}'] = sig
-        results.append(row)
-    return pd.DataFrame(results)
-
-@st.cache_data
+    counts = df[target_col].dropna().astype(int).value_counts()
+    return tom_comparisons(counts.index, counts.to_numpy()).table(ref_brand)
+
+@cached
+def calculate_segmented_nps_with_sig(df, segment_col, ref_col_name="q7_3"):
+    """NPS by segment for one segment column, or for a list of them in the same pass.
+    With a list, each segmentation's rows are stacked and labelled in a leading 'Segmentation' column."""
+    df = lowercase_columns(df)
+    segment_cols = [segment_col.lower()] if isinstance(segment_col, str) else [str(c).lower() for c in segment_col]
+    q7_cols = wave_schema(df).q7_cols
+    q_ref = next((col for col in q7_cols if col == ref_col_name.lower()), None)
+    if q_ref is None: raise ValueError(f"Reference column '{ref_col_name}' must be present.")
+    codes, segments, segmentations = [], [], []
+    for col in segment_cols:
+        col_codes, uniques = pd.factorize(df[col])
+        codes.append(np.where(col_codes >= 0, col_codes + len(segments), -1))
+        segments.extend(uniques); segmentations.extend([col] * len(uniques))
+    if not segments: return pd.DataFrame()
+    hist = rating_histograms(df, q7_cols, np.column_stack(codes), len(segments))
+    return segmented_nps_comparisons(segments, segmentations, q7_cols, hist, labelled=not isinstance(segment_col, str)).table(q_ref)
+
+@cached
 def compute_dynamic_imagery(df, base_counts, ref_col_name="q7_3"):
-    df.columns = [str(c).lower() for c in df.columns]
+    df = lowercase_columns(df)
     ref_col_name = ref_col_name.lower()
-    q7_cols = [col for col in df.columns if col.startswith("q7_")]
+    schema = wave_schema(df)
+    q7_cols = schema.q7_cols
     q_ref = next((col for col in q7_cols if col == ref_col_name), None)
     if q_ref is None: raise ValueError(f"Reference column '{ref_col_name}' not found.")
-    q6_pattern = re.compile(r"^(q6a)[._/](\d+)[._/](\d+)$")
-    q6_lookup = {}
-    question_numbers = set()
-    for col in df.columns:
-        match = q6_pattern.match(col)
-        if match:
-            q_num, b_num = match.group(2), match.group(3)
-            if int(q_num) <= 18:
-                q6_lookup[(q_num, b_num)] = col
-                question_numbers.add(q_num)
-    results = []
-    for q_num in sorted(list(question_numbers)):
-        row = {'Question': f'q6a.{q_num}'}
-        for q7_col in q7_cols:
-            brand_num_match = re.search(r'_(\d+)', q7_col)
-            if not brand_num_match: continue
-            brand_num = brand_num_match.group(1)
-            q6_col = q6_lookup.get((q_num, brand_num))
-            brand_rows = df[df[q7_col].notna()]
-            if q6_col and q6_col in brand_rows.columns and not brand_rows.empty:
-                score = (brand_rows[q6_col] >= 1).sum() / len(brand_rows) * 100
-                row[q7_col] = round(score)
-            else: row[q7_col] = np.nan
-        results.append(row)
-    imagery_df = pd.DataFrame(results)
-    for q7_col in q7_cols:
-        if q7_col != q_ref:
-            z_scores, sig_results, diff_results = [], [], []
-            n1, n2 = base_counts.get(q_ref, 0), base_counts.get(q7_col, 0)
-            for _, row in imagery_df.iterrows():
-                p1, p2 = row.get(q_ref), row.get(q7_col)
-                if n1 < 45 or n2 < 45 or pd.isna(n1) or pd.isna(n2):
-                    diff_results.append("LB"); z_scores.append(np.nan); sig_results.append("LB")
-                elif n1 > 0 and n2 > 0 and pd.notna(p1) and pd.notna(p2):
-                    diff = p1 - p2
-                    _, z, sig = calculate_se_and_z_excel_style(p1, p2, n1, n2)
-                    diff_results.append(round(diff,2)); z_scores.append(z); sig_results.append(sig)
-                else:
-                    diff_results.append(np.nan); z_scores.append(np.nan); sig_results.append("Insufficient base")
-            imagery_df[f'{q_ref}_minus_{q7_col}'] = diff_results
-            imagery_df[f'Z_{q_ref}_vs_{q7_col}'] = z_scores
-            imagery_df[f'Sig_{q_ref}_vs_{q7_col}'] = sig_results
-    return imagery_df
-
-@st.cache_data
+    answered = answered_matrix(df, q7_cols)
+    agree, asked = imagery_hit_tensor(df, schema)
+    hits = np.where(asked, (agree & answered[:, None, :]).sum(axis=0), np.nan)
+    return imagery_comparisons(schema.statements, q7_cols, hits, answered.sum(axis=0), base_counts, schema.q7_brands).table(q_ref)
+
+@cached
 def sectional_nps(df, reference_brand="q12b_3", max_q_num=10):
-    df.columns = [str(c).lower() for c in df.columns]
-    reference_brand = reference_brand.lower()
-    q12b_pattern = re.compile(r"^q12b[._/](\d+)[._/](\d+)")
-    results_list = []
-    for col in df.columns:
-        match = q12b_pattern.match(col)
-        if match:
-            brand_num, section_num = match.group(1), int(match.group(2))
-            if section_num <= max_q_num:
-                series = pd.to_numeric(df[col], errors='coerce').dropna()
-                if not series.empty:
-                    freq = series.value_counts().reindex(range(11), fill_value=0)
-                    promoters = freq[9] + freq[10]
-                    detractors = freq.loc[0:6].sum()
-                    nps = round((promoters - detractors) / len(series) * 100)
-                    results_list.append({'section': section_num, 'brand_col_name': f'q12b_{brand_num}', 'nps': nps, 'base': len(series)})
-    if not results_list: return pd.DataFrame()
-    temp_df = pd.DataFrame(results_list)
-    nps_df = temp_df.pivot_table(index='section', columns='brand_col_name', values='nps').reset_index()
-    base_df = temp_df.pivot_table(index='section', columns='brand_col_name', values='base').reset_index()
-    nps_df.rename(columns={'section': 'Q No.'}, inplace=True)
-    base_df.rename(columns={'section': 'Q No.'}, inplace=True)
-    return _add_comparison_and_sig_tests(nps_df, base_df, reference_brand, 'nps', 'Q No.')
\ No newline at end of file
+    df = lowercase_columns(df)
+    section_cols, brand_nums, section_nums = wave_schema(df).sections(max_q_num)
+    return sectional_nps_comparisons(section_nums, brand_nums, rating_histograms(df, section_cols)).table(reference_brand.lower())
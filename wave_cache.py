@@ -0,0 +1,81 @@
+# wave_cache.py
+
+import os
+import glob
+import hashlib
+import functools
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.environ.get("WAVE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wave_cache"))
+DEFAULT_MAX_MB = float(os.environ.get("WAVE_CACHE_MAX_MB", 1024))
+CACHE_FORMAT = 2  # bump when the parsed frame layout changes (2: pruned columns, compact dtypes)
+
+class WaveCache:
+    """On-disk store of parsed wave files, keyed by Drive file ID plus the file's version (md5Checksum or modifiedTime).
+    Frames are written as Parquet (pickle when a column has mixed types Parquet can't hold). Reading a file refreshes its
+    mtime, and the least recently used files are evicted once the directory grows past max_mb."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _stem(self, file_id, version):
+        return os.path.join(self.cache_dir, f"{file_id}.{hashlib.sha1(f'{version}:{CACHE_FORMAT}'.encode()).hexdigest()[:16]}")
+
+    def get(self, file_id, version):
+        if not version: return None
+        stem = self._stem(file_id, version)
+        for ext, reader in ((".parquet", pd.read_parquet), (".pkl", pd.read_pickle)):
+            path = stem + ext
+            if not os.path.exists(path): continue
+            try:
+                df = reader(path)
+            except Exception:
+                self._remove(path); return None
+            os.utime(path)
+            return df
+        return None
+
+    def put(self, file_id, version, df):
+        """Stores df for this version, dropping older versions of the same file. Returns the cached path, or None."""
+        if not version: return None
+        for stale in glob.glob(os.path.join(self.cache_dir, f"{glob.escape(file_id)}.*")): self._remove(stale)
+        stem = self._stem(file_id, version)
+        try:
+            path = self._write(stem + ".parquet", lambda p: df.to_parquet(p))
+        except Exception:
+            try: path = self._write(stem + ".pkl", lambda p: df.to_pickle(p))
+            except Exception: return None
+        self._evict()
+        return path
+
+    def _write(self, path, writer):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            writer(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            self._remove(tmp_path)
+        return path
+
+    def _evict(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*")):
+            if path.endswith(".tmp"): continue
+            try: stat = os.stat(path)
+            except OSError: continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            self._remove(path); total -= size
+
+    @staticmethod
+    def _remove(path):
+        try: os.remove(path)
+        except OSError: pass
+
+@functools.lru_cache(maxsize=None)
+def default_wave_cache():
+    return WaveCache()
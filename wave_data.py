@@ -0,0 +1,100 @@
+# wave_data.py
+
+import re
+import functools
+import numpy as np
+import pandas as pd
+
+Q6_PATTERN = re.compile(r"^(q6a)[._/](\d+)[._/](\d+)$")
+Q12B_PATTERN = re.compile(r"^q12b[._/](\d+)[._/](\d+)")
+MAX_IMAGERY_STATEMENT = 18
+BRAND_LINKED = ['q6a.1', 'q6a.2', 'q6a.3', 'q6a.4', 'q6a.11', 'q6a.12', 'q6a.15', 'q6a.18']
+PRODUCT_LINKED = ['q6a.5', 'q6a.6', 'q6a.7', 'q6a.8', 'q6a.9', 'q6a.10', 'q6a.13', 'q6a.14', 'q6a.16', 'q6a.17']
+WAVE_COLUMN_PATTERN = re.compile(r"^(?:q1a|sq1b|sec|sech_cod|q5a_1|q5a_brand1)$|^(?:q7_|q6a|q12b)")
+
+class WaveSchema:
+    """Index of a wave's question columns, built from one scan of its lowercase column names.
+    Columns resolve by (family, statement, brand) lookup - ('q7', None, brand), ('q6a', statement, brand),
+    ('q12b', section, brand), ('q5a', None, None) - with numbers kept as the strings that appear in the names."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.positions = {col: i for i, col in enumerate(self.columns)}
+        self.index = {}
+        self.q7_cols, self.q7_brands = [], {}
+        self.section_cols, self.section_brands, self.section_nums = [], [], []
+        self.tom_col = None
+        for col in self.columns:
+            if col.startswith("q7_"):
+                self.q7_cols.append(col)
+                match = re.search(r'_(\d+)', col)
+                if match: self.q7_brands[col] = match.group(1); self.index.setdefault(('q7', None, match.group(1)), col)
+            elif col.startswith("q6a"):
+                match = Q6_PATTERN.match(col)
+                if match and int(match.group(2)) <= MAX_IMAGERY_STATEMENT: self.index[('q6a', match.group(2), match.group(3))] = col
+            elif col.startswith("q12b"):
+                match = Q12B_PATTERN.match(col)
+                if match:
+                    self.section_cols.append(col); self.section_brands.append(match.group(1)); self.section_nums.append(int(match.group(2)))
+                    self.index.setdefault(('q12b', match.group(2), match.group(1)), col)
+            elif self.tom_col is None and col in ['q5a_1', 'q5a_brand1']:
+                self.tom_col = col
+        if self.tom_col is not None: self.index[('q5a', None, None)] = self.tom_col
+        self.statements = sorted({statement for family, statement, _ in self.index if family == 'q6a'})
+
+    def column(self, family, statement=None, brand=None):
+        return self.index.get((family, statement, brand))
+
+    def position(self, family, statement=None, brand=None):
+        col = self.column(family, statement, brand)
+        return None if col is None else self.positions[col]
+
+    def imagery_column(self, statement, q7_col):
+        """q6a column for a statement and the brand of a q7 column, or None."""
+        return self.index.get(('q6a', statement, self.q7_brands.get(q7_col)))
+
+    def sections(self, max_q_num=None):
+        keep = [k for k, section in enumerate(self.section_nums) if max_q_num is None or section <= max_q_num]
+        return [self.section_cols[k] for k in keep], [self.section_brands[k] for k in keep], [self.section_nums[k] for k in keep]
+
+    def brand_bases(self, df):
+        """Respondents with a q7 answer, per q7 column of df."""
+        return {col: int(df[col].notna().sum()) for col in self.q7_cols}
+
+@functools.lru_cache(maxsize=64)
+def _schema_for(columns):
+    return WaveSchema(columns)
+
+def wave_schema(df):
+    """The WaveSchema for df's (lowercase) columns; built once per distinct column layout."""
+    return _schema_for(tuple(df.columns))
+
+def is_wave_column(name):
+    """Whether the dashboard reads this column: the segment sources (q1a, sq1b, sec/sech_cod) and the q5a/q6a/q7/q12b
+    questions WaveSchema indexes."""
+    return WAVE_COLUMN_PATTERN.match(str(name).strip().lower()) is not None
+
+def wave_sort_key(name):
+    """Orders wave file names by their numbers, so W2 comes before W10 and waves stack oldest first."""
+    return [(0, int(part)) if part.isdigit() else (1, part.lower()) for part in re.split(r'(\d+)', str(name)) if part]
+
+def lowercase_columns(df):
+    """df with lowercase column names; returned as-is when already canonical, otherwise relabelled without touching the data."""
+    columns = [str(c).lower() for c in df.columns]
+    return df if columns == list(df.columns) else df.set_axis(columns, axis=1)
+
+def normalize_wave(df):
+    """Canonical form of a loaded wave: lowercase column names plus the derived gender, age_group and nccs_group columns
+    (as categoricals).
+    The input is never mutated and the respondent columns are not copied; analyses take column subsets of the result,
+    which callers treat as read-only."""
+    wave = lowercase_columns(df)
+    derived = {}
+    if 'q1a' in wave.columns: derived['gender'] = pd.Categorical(wave['q1a'].map({1: 'Male', 2: 'Female'}), categories=['Male', 'Female'])
+    if 'sq1b' in wave.columns: derived['age_group'] = pd.cut(wave['sq1b'], bins=[24, 34, 45], labels=['25–34', '35–45'], right=True)
+    sec_col = next((c for c in ['sec', 'sech_cod'] if c in wave.columns), None)
+    if sec_col:
+        sec = wave[sec_col]
+        derived['nccs_group'] = pd.Categorical(np.select([sec.isin([1, 2, 3]), sec.isin([4, 5, 6, 7])], ['NCCS A', 'NCCS B+C'], None), categories=['NCCS A', 'NCCS B+C'])
+    if not derived: return wave
+    return pd.concat([wave.drop(columns=[c for c in derived if c in wave.columns]), pd.DataFrame(derived, index=wave.index)], axis=1)
@@ -0,0 +1,103 @@
+# wave_excel.py
+
+import logging
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.cell import column_index_from_string
+try: from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError: WorkSheetParser = object  # private API moved: read_wave_excel falls back to pd.read_excel
+
+from wave_data import is_wave_column
+
+logger = logging.getLogger(__name__)
+
+_DIGITS = "0123456789"
+# pd.read_excel's default na_values: text cells it reads as missing
+NA_STRINGS = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+class _PrunedSheetParser(WorkSheetParser):
+    """openpyxl's streaming sheet parser, except that once `wanted` (1-based column -> position) is set only the cells of
+    those columns are converted; every other cell of the row is skipped after reading its reference."""
+    wanted = None
+
+    def parse_row(self, row):
+        if self.wanted is None: return super().parse_row(row)
+        ref = row.get('r')
+        self.row_counter = int(float(ref)) if ref else self.row_counter + 1
+        cells, column = [], 0
+        for element in row:
+            ref = element.get('r')
+            column = column_index_from_string(ref.rstrip(_DIGITS)) if ref else column + 1
+            if column in self.wanted:
+                self.col_counter = column - 1
+                cells.append(self.parse_cell(element))
+        return self.row_counter, cells
+
+def _header_names(cells):
+    """{column: name} for the header row, named the way pd.read_excel names them (blank -> 'Unnamed: i', repeats -> 'x.1')."""
+    values = {cell['column']: cell['value'] for cell in cells}
+    names, seen = {}, {}
+    for column in range(1, max(values, default=0) + 1):
+        name = values.get(column)
+        if name is None: name = f"Unnamed: {column - 1}"
+        if name in seen:
+            seen[name] += 1; name = f"{name}.{seen[name]}"
+        else: seen[name] = 0
+        names[column] = name
+    return names
+
+def _compact(values, other):
+    """One column from its float buffer plus any non-numeric cells: whole numbers in 0-255 (ratings, codes) as nullable
+    UInt8, other numbers as float64, anything holding text or dates as object."""
+    if other:
+        column = values.astype(object)
+        for row, value in other.items(): column[row] = value
+        return column
+    answered = ~np.isnan(values)
+    answers = values[answered]
+    if answers.size and answers.min() >= 0 and answers.max() <= 255 and np.all(answers == np.floor(answers)):
+        return pd.arrays.IntegerArray(np.where(answered, values, 0).astype(np.uint8), ~answered)
+    return values
+
+def read_wave_excel(source, keep=is_wave_column):
+    """First sheet of a wave workbook with only the header columns keep() accepts, streamed in openpyxl read-only mode.
+    Cells of the other columns are never converted, values land in a float buffer as they are read, and each column is
+    then stored in the most compact dtype that holds it. Text cells pandas reads as missing ('NA', '#N/A', ...; see
+    NA_STRINGS) are missing here too, and rows with nothing else in the kept columns are dropped.
+    The pruned parser relies on openpyxl internals (pinned in requirements.txt); if it fails the sheet is read with
+    pd.read_excel(usecols=keep) instead, which gives the same rows and values in pandas' default dtypes."""
+    try:
+        return _read_pruned(source, keep)
+    except Exception as e:
+        logger.warning("Pruned Excel read failed (%s: %s); falling back to pd.read_excel.", type(e).__name__, e)
+        if hasattr(source, 'seek'): source.seek(0)
+        return pd.read_excel(source, usecols=keep).dropna(how='all')
+
+def _read_pruned(source, keep):
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        with ws._get_source() as src:
+            parser = _PrunedSheetParser(src, ws._shared_strings, data_only=True, epoch=wb.epoch, date_formats=wb._date_formats, timedelta_formats=wb._timedelta_formats)
+            rows = parser.parse()
+            header = next(rows, None)
+            if header is None: return pd.DataFrame()
+            header_row, names = header[0], _header_names(header[1])
+            kept = [column for column, name in names.items() if keep(name)]
+            parser.wanted = {column: j for j, column in enumerate(kept)}
+            values = np.full((1024, len(kept)), np.nan)  # ws.max_row may cost a full extra pass over the sheet
+            other, labels = {}, []
+            for row_number, cells in rows:
+                present = [(parser.wanted[cell['column']], cell['value']) for cell in cells if cell['value'] is not None and not (type(cell['value']) is str and cell['value'] in NA_STRINGS)]
+                if not present: continue
+                n = len(labels)
+                if n == len(values): values = np.concatenate([values, np.full_like(values, np.nan)])
+                for j, value in present:
+                    if type(value) in (int, float): values[n, j] = value
+                    else: other.setdefault(j, {})[n] = value
+                labels.append(row_number - header_row - 1)
+    finally:
+        wb.close()
+    n = len(labels)
+    return pd.DataFrame({names[column]: _compact(values[:n, j], other.get(j)) for j, column in enumerate(kept)}, index=pd.Index(labels, dtype=np.int64))
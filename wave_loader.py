@@ -0,0 +1,55 @@
+# wave_loader.py
+
+import io
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from wave_cache import default_wave_cache
+from wave_excel import read_wave_excel
+from perf_trace import stage, cache_event
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("WAVE_LOAD_WORKERS", 4))
+
+_thread_state = threading.local()
+
+def _thread_http(drive_service):
+    """googleapiclient's shared httplib2 connection is not thread-safe, so each worker thread gets its own authorized one.
+    Returns None for clients without one (e.g. LocalDriveService), which then use their default transport."""
+    credentials = getattr(getattr(drive_service, '_http', None), 'credentials', None)
+    if credentials is None: return None
+    if getattr(_thread_state, 'credentials', None) is not credentials:
+        import httplib2
+        import google_auth_httplib2
+        _thread_state.http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        _thread_state.credentials = credentials
+    return _thread_state.http
+
+def fetch_wave(drive_service, file_id, version=None, wave_cache=None):
+    """Returns one parsed wave, from the local cache when this version was seen before, else downloaded from Drive."""
+    wave_cache = wave_cache or default_wave_cache()
+    with stage('wave_cache.get', 'io', file_id=file_id): df = wave_cache.get(file_id, version)
+    cache_event('wave_cache', df is not None)
+    if df is None:
+        with stage('drive.download', 'io', file_id=file_id):
+            http = _thread_http(drive_service)
+            request = drive_service.files().get_media(fileId=file_id)
+            content = request.execute(http=http) if http is not None else request.execute()
+        with stage('excel.parse', 'parse', file_id=file_id, size_mb=round(len(content) / 1024 / 1024, 2)): df = read_wave_excel(io.BytesIO(content))
+        with stage('wave_cache.put', 'io', file_id=file_id): wave_cache.put(file_id, version, df)
+    return df
+
+def load_waves(drive_service, wave_files, max_workers=DEFAULT_MAX_WORKERS, fetch=fetch_wave):
+    """Loads {wave_key: (file_id, version)} concurrently on at most max_workers threads.
+    Returns ({wave_key: df}, {wave_key: exception}); both keep the order of wave_files. Each task runs in a copy of the
+    caller's context, so stages it records land in the caller's active trace."""
+    if not wave_files: return {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(wave_files)))) as pool:
+        futures = {wave_key: pool.submit(contextvars.copy_context().run, fetch, drive_service, file_id, version) for wave_key, (file_id, version) in wave_files.items()}
+    loaded, errors = {}, {}
+    for wave_key, future in futures.items():
+        error = future.exception()
+        if error is None: loaded[wave_key] = future.result()
+        else: errors[wave_key] = error
+    return loaded, errors
@@ -0,0 +1,108 @@
+# wave_registry.py
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from analytics_cube import WaveCube
+from wave_trend import WaveTrend
+from wave_data import wave_schema
+from perf_trace import stage, cache_event
+
+WaveKey = namedtuple('WaveKey', ['file_id', 'version'])
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)): return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict): return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+class WaveRegistry:
+    """Loaded waves and their cubes, looked up by WaveKey (Drive file ID + version) instead of by hashing frames.
+    Analysis results are memoized on (wave key, filters, analysis, parameters), so a cache lookup costs the same whatever
+    the respondent count. Both stores are LRU-bounded; hit/miss counters are kept for verification."""
+
+    def __init__(self, max_waves=32, max_results=1024):
+        self.max_waves, self.max_results = max_waves, max_results
+        self._waves, self._cubes, self._results, self._trends = OrderedDict(), {}, OrderedDict(), OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock: return key in self._waves
+
+    def add(self, key, df):
+        with self._lock:
+            self._waves[key] = df; self._waves.move_to_end(key)
+            wave_schema(df)
+            self._cubes.pop(key, None)
+            while len(self._waves) > self.max_waves:
+                old_key, _ = self._waves.popitem(last=False)
+                self._cubes.pop(old_key, None)
+                for result_key in [k for k in self._results if k[0] == old_key]: del self._results[result_key]
+                for trend_key in [k for k in self._trends if old_key in k[0]]: del self._trends[trend_key]
+
+    def frame(self, key):
+        with self._lock:
+            self._waves.move_to_end(key)
+            return self._waves[key]
+
+    def get(self, key):
+        """The wave's frame, or None when it is not (or no longer) loaded; a single lookup, so another session evicting
+        the wave between a membership check and the read cannot raise."""
+        with self._lock:
+            df = self._waves.get(key)
+            if df is not None: self._waves.move_to_end(key)
+            return df
+
+    def schema(self, key):
+        return wave_schema(self.frame(key))
+
+    def cube(self, key, df=None):
+        """The wave's WaveCube, built outside the lock so other waves' lookups don't wait on it; if two threads race on
+        the same key the first cube stored wins. df is the frame the caller holds for key: a wave another session evicted
+        in the meantime is added back from it instead of raising KeyError."""
+        with self._lock:
+            if key in self._cubes: return self._cubes[key]
+            if df is None: df = self.frame(key)
+            elif key not in self._waves: self.add(key, df)
+        with stage('cube.build', 'analysis', file_id=key.file_id): cube = WaveCube(df)
+        with self._lock:
+            return self._cubes.setdefault(key, cube) if key in self._waves else cube
+
+    def analysis(self, key, filters, name, frame=None, **params):
+        """Result of WaveCube.<name>(cells, **params) for the (gender, age_group, nccs_group) filter tuple; frame is
+        passed on to cube()."""
+        result_key = (key, tuple(filters), name, _freeze(params))
+        with self._lock:
+            cache_event('registry', result_key in self._results)
+            if result_key in self._results:
+                self.hits += 1; self._results.move_to_end(result_key)
+                return self._results[result_key]
+            self.misses += 1
+        cube = self.cube(key, frame)
+        with stage(f'analysis.{name}', 'analysis', file_id=key.file_id, filters=list(filters)): result = getattr(cube, name)(cube.cell_mask(*filters), **params)
+        with self._lock:
+            self._results[result_key] = result
+            while len(self._results) > self.max_results: self._results.popitem(last=False)
+        return result
+
+    def trend(self, keys, filters, labels=None, frames=None):
+        """WaveTrend of the waves under keys (in order, labelled by labels) for the filter tuple, memoized like analyses;
+        frames, one per key, are passed on to cube()."""
+        trend_key = (tuple(keys), tuple(filters), tuple(labels or keys))
+        with self._lock:
+            cache_event('registry', trend_key in self._trends)
+            if trend_key in self._trends:
+                self.hits += 1; self._trends.move_to_end(trend_key)
+                return self._trends[trend_key]
+            self.misses += 1
+        cubes = [self.cube(key, df) for key, df in zip(keys, frames or [None] * len(keys))]
+        with stage('analysis.trend', 'analysis', waves=len(cubes), filters=list(filters)):
+            trend = WaveTrend(labels or [key.file_id for key in keys], cubes, [cube.cell_mask(*filters) for cube in cubes])
+        with self._lock:
+            self._trends[trend_key] = trend
+            while len(self._trends) > self.max_results: self._trends.popitem(last=False)
+        return trend
+
+    def stats(self):
+        with self._lock:
+            return {'waves': len(self._waves), 'cubes': len(self._cubes), 'results': len(self._results), 'trends': len(self._trends), 'hits': self.hits, 'misses': self.misses}
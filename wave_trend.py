@@ -0,0 +1,89 @@
+# wave_trend.py
+
+import numpy as np
+import pandas as pd
+
+from utils_V2_new import NPS_SCALE_POINTS, nps_from_histograms, wave_over_wave
+
+PREVIOUS_WAVE = 'previous wave'
+
+def _union(sequences, key=None):
+    """Items of all sequences, each once, in first-seen order (or sorted by key)."""
+    seen = {}
+    for sequence in sequences:
+        for item in sequence: seen.setdefault(item, None)
+    return sorted(seen, key=key) if key is not None else list(seen)
+
+class WaveTrend:
+    """Sufficient statistics of a city's waves for one filter selection, stacked along a leading wave axis: NPS
+    histograms (waves, brands, 12) with the q7 bases, imagery hits (waves, statements, brands), TOM counts (waves, values)
+    and sectional histograms (waves, sections, brands, 12). Brands, statements and sections are the union over the waves;
+    a wave without one has a zero base, which the 45-base rule reports as LB (a TOM value a wave's q5a never holds is NaN
+    rather than 0%, with a zero base too). Each metric's wave-over-wave Diff/Z/Sig comes
+    from one wave_over_wave call on the stacked scores, so the cost grows with the waves but not with the respondents."""
+
+    def __init__(self, waves, cubes, masks):
+        self.waves = list(waves)
+        n_waves, width = len(self.waves), NPS_SCALE_POINTS + 1
+        self.q7_cols = _union(cube.q7_cols for cube in cubes)
+        self.statements = _union((cube.question_numbers for cube in cubes), key=int)
+        self.tom_values = _union((cube.tom_values for cube in cubes), key=int)
+        self.sections = _union((cube.section_nums for cube in cubes), key=int)
+        self.section_brands = _union((cube.section_brands for cube in cubes), key=int)
+
+        self.nps_hist = np.zeros((n_waves, len(self.q7_cols), width), dtype=np.int64)
+        self.brand_base = np.zeros((n_waves, len(self.q7_cols)), dtype=np.int64)
+        self.imagery_hits = np.full((n_waves, len(self.statements), len(self.q7_cols)), np.nan)
+        self.tom_counts = np.zeros((n_waves, len(self.tom_values)), dtype=np.int64)
+        self.tom_present = np.zeros(self.tom_counts.shape, dtype=bool)
+        self.section_hist = np.zeros((n_waves, len(self.sections), len(self.section_brands), width), dtype=np.int64)
+        for w, (cube, mask) in enumerate(zip(cubes, masks)):
+            brands = [self.q7_cols.index(col) for col in cube.q7_cols]
+            self.nps_hist[w, brands] = cube.nps_hist[mask].sum(axis=0)
+            self.brand_base[w, brands] = cube.brand_base[mask].sum(axis=0)
+            statements = [self.statements.index(q_num) for q_num in cube.question_numbers]
+            self.imagery_hits[w][np.ix_(statements, brands)] = np.where(cube.imagery_asked, cube.imagery_hits[mask].sum(axis=0), np.nan)
+            values = [self.tom_values.index(value) for value in cube.tom_values]
+            self.tom_counts[w, values] = cube.tom_counts[mask].sum(axis=0); self.tom_present[w, values] = True
+            if cube.section_cols:
+                rows = [self.sections.index(section) for section in cube.section_nums]
+                cols = [self.section_brands.index(brand) for brand in cube.section_brands]
+                np.add.at(self.section_hist[w], (rows, cols), cube.section_hist[mask].sum(axis=0))
+
+        self.nps, nps_base = nps_from_histograms(self.nps_hist)
+        self.nps_changes = wave_over_wave(self.nps, nps_base)
+        respondents = self.brand_base[:, None, :].astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.imagery = np.where(respondents > 0, np.round(self.imagery_hits / respondents * 100), np.nan)
+        self.imagery_changes = wave_over_wave(self.imagery, respondents, insufficient_diff=np.nan)
+        total = self.tom_counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.tom = np.where(self.tom_present & (total > 0), np.round(self.tom_counts / total * 100), np.nan)
+        self.tom_changes = wave_over_wave(self.tom, np.where(self.tom_present, total, 0))
+        self.sectional, section_base = nps_from_histograms(self.section_hist)
+        self.sectional_changes = wave_over_wave(self.sectional, section_base)
+
+    def _table(self, cols, scores, changes):
+        """One row per wave: the score columns, then '<col>_minus_previous wave' Diff/Z/Sig columns per score column."""
+        diff, z, sig = changes
+        columns = {'Wave': self.waves, **{col: scores[:, j] for j, col in enumerate(cols)}}
+        for j, col in enumerate(cols):
+            columns[f'{col}_minus_{PREVIOUS_WAVE}'] = diff[:, j].tolist()
+            columns[f'Z_{col}_vs_{PREVIOUS_WAVE}'] = z[:, j]
+            columns[f'Sig_{col}_vs_{PREVIOUS_WAVE}'] = sig[:, j].tolist()
+        return pd.DataFrame(columns)
+
+    def nps_table(self):
+        return self._table(self.q7_cols, self.nps, self.nps_changes)
+
+    def imagery_table(self, statement):
+        s = self.statements.index(str(statement))
+        return self._table(self.q7_cols, self.imagery[:, s], tuple(a[:, s] for a in self.imagery_changes))
+
+    def tom_table(self, label=str):
+        """TOM shares per wave; columns are label(brand value), e.g. a mapper's brand_value."""
+        return self._table([label(value) for value in self.tom_values], self.tom, self.tom_changes)
+
+    def sectional_table(self, section):
+        s = self.sections.index(int(section))
+        return self._table([f'q12b_{brand}' for brand in self.section_brands], self.sectional[:, s], tuple(a[:, s] for a in self.sectional_changes))